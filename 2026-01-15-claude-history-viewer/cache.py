@@ -0,0 +1,153 @@
+"""Byte-bounded LRU cache for parsed and rendered sessions.
+
+Entries live in memory up to max_bytes. With a disk directory, entries
+evicted from memory are written there (pickled) and promoted back on the
+next hit, so a restart or a burst of other sessions doesn't force a re-parse.
+Keys should include the session file's mtime and size: a changed file then
+simply misses, and its stale entries age out. Several processes (web.py
+serve workers) can share one disk directory; files are replaced atomically.
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+def value_size(value) -> int:
+    """Approximate size in bytes of a cached value."""
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode())
+    return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by total value size."""
+
+    def __init__(self, max_bytes: int, disk_dir: Path | None = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._items: OrderedDict = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_dir:
+            disk_dir.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key):
+        """Cached value for key, or None."""
+        with self._lock:
+            item = self._items.get(key)
+            if item:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[0]
+
+        value = self._disk_get(key)
+        if value is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.disk_hits += 1
+        self.put(key, value)
+        return value
+
+    def put(self, key, value, size: int | None = None):
+        """Store value, evicting least recently used entries beyond max_bytes."""
+        size = value_size(value) if size is None else size
+        if size > self.max_bytes:
+            self._disk_put(key, value)
+            return
+
+        evicted = []
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old:
+                self._bytes -= old[1]
+            self._items[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                old_key, (old_value, old_size) = self._items.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+                evicted.append((old_key, old_value))
+
+        # Demote outside the lock; pickling and writing may be slow
+        for old_key, old_value in evicted:
+            self._disk_put(old_key, old_value)
+
+    def stats(self) -> dict:
+        """Counters and current size, for monitoring."""
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _disk_path(self, key) -> Path:
+        return self.disk_dir / (hashlib.sha1(repr(key).encode()).hexdigest() + ".pickle")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                stored_key, value = pickle.load(f)
+            # Touch, so trimming removes the least recently used files first
+            os.utime(path)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        # Guard against hash collisions
+        return value if stored_key == key else None
+
+    def _disk_put(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump((key, value), f, pickle.HIGHEST_PROTOCOL)
+            tmp.replace(path)
+        except OSError:
+            return
+        self._trim_disk()
+
+    def _trim_disk(self):
+        """Remove the oldest cache files beyond disk_max_bytes."""
+        if not self.disk_max_bytes:
+            return
+        files = []
+        total = 0
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".pickle"):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    # Trimmed by another process sharing the directory
+                    continue
+                files.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
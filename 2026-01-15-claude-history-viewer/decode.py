@@ -0,0 +1,42 @@
+"""JSON decoding for session and history lines.
+
+Picks the fastest installed backend: orjson, then msgspec, then the stdlib.
+"""
+
+import json
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson:
+    BACKEND = "orjson"
+    loads = orjson.loads
+elif msgspec:
+    BACKEND = "msgspec"
+    loads = msgspec.json.Decoder().decode
+else:
+    BACKEND = "json"
+    loads = json.loads
+
+# Catch this around loads()/decode_entry(); orjson's error subclasses json's
+DecodeError = (json.JSONDecodeError, msgspec.DecodeError) if msgspec else json.JSONDecodeError
+
+# Session lines are decoded whole: rebuilding a typed msgspec schema's
+# Structs as the dicts the viewer uses costs more than orjson's full decode
+decode_entry = loads
+
+
+def iter_complete_lines(f):
+    """Lines of a binary file from its position, stopping at a line without a
+    newline: that one is still being written, and is read once it is complete."""
+    for line in f:
+        if not line.endswith(b"\n"):
+            return
+        yield line
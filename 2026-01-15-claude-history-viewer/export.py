@@ -0,0 +1,266 @@
+"""Export sessions to columnar files (Parquet or Arrow IPC) for analysis.
+
+Sessions are flattened into four tables: messages (one row per JSONL line
+with a message), content_blocks, tool_calls and tool_results. Each table is
+a hive-partitioned dataset, one file per project:
+
+    out/messages/project=<encoded>/part.parquet
+
+so pyarrow.dataset, pandas, polars or DuckDB can read out/<table> directly
+and filter on project. Rows are written in row groups as they are read,
+keeping memory flat however large the history is.
+
+Exports are incremental: out/_export.json records the mtime and size of
+every exported session, and only projects with new, changed or removed
+sessions are rewritten.
+
+Needs pyarrow (the `export` extra).
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+
+from decode import DecodeError, iter_complete_lines, loads
+from scan import scan_projects
+from stats import USAGE_FIELDS, parse_time
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Bump when a schema changes; the next export then rewrites everything
+EXPORT_VERSION = 1
+MANIFEST = "_export.json"
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# Rows, or bytes of text, buffered per table before they are written out as a row group
+ROW_GROUP_ROWS = 50_000
+ROW_GROUP_BYTES = 64 * 1024 * 1024
+
+if pa:
+    TIMESTAMP = pa.timestamp("ms", tz="UTC")
+
+    SCHEMAS = {
+        "messages": pa.schema([
+            ("session_id", pa.string()),
+            ("line_no", pa.int32()),
+            ("uuid", pa.string()),
+            ("parent_uuid", pa.string()),
+            ("type", pa.string()),
+            ("timestamp", TIMESTAMP),
+            ("is_sidechain", pa.bool_()),
+            ("model", pa.string()),
+            # Replies split over several lines repeat message_id and usage
+            ("message_id", pa.string()),
+            *[(field, pa.int64()) for field in USAGE_FIELDS],
+        ]),
+        "content_blocks": pa.schema([
+            ("session_id", pa.string()),
+            ("line_no", pa.int32()),
+            ("block_index", pa.int32()),
+            ("role", pa.string()),
+            ("type", pa.string()),
+            ("text", pa.string()),  # text or thinking
+            ("tool_use_id", pa.string()),  # tool_use and tool_result blocks
+        ]),
+        "tool_calls": pa.schema([
+            ("session_id", pa.string()),
+            ("line_no", pa.int32()),
+            ("tool_use_id", pa.string()),
+            ("name", pa.string()),
+            ("input", pa.string()),  # JSON
+            ("timestamp", TIMESTAMP),
+        ]),
+        "tool_results": pa.schema([
+            ("session_id", pa.string()),
+            ("line_no", pa.int32()),
+            ("tool_use_id", pa.string()),
+            ("content", pa.string()),
+            ("is_error", pa.bool_()),
+            ("timestamp", TIMESTAMP),
+        ]),
+    }
+
+
+def _result_text(content) -> str:
+    """Text of a tool_result's content, which is a string or a list of blocks."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return ""
+
+
+def flatten(session_id: str, line_no: int, msg: dict):
+    """Yield (table, row) for one decoded session line."""
+    message = msg.get("message")
+    if not isinstance(message, dict):
+        return
+    timestamp = parse_time(msg.get("timestamp"))
+    usage = message.get("usage") or {}
+    yield "messages", {
+        "session_id": session_id,
+        "line_no": line_no,
+        "uuid": msg.get("uuid"),
+        "parent_uuid": msg.get("parentUuid"),
+        "type": msg.get("type"),
+        "timestamp": timestamp,
+        "is_sidechain": msg.get("isSidechain"),
+        "model": message.get("model"),
+        "message_id": message.get("id"),
+        **{field: usage.get(field) for field in USAGE_FIELDS},
+    }
+
+    content = message.get("content")
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    if not isinstance(content, list):
+        return
+    for block_index, block in enumerate(content):
+        if not isinstance(block, dict):
+            continue
+        block_type = block.get("type")
+        tool_use_id = block.get("id") if block_type == "tool_use" else block.get("tool_use_id")
+        yield "content_blocks", {
+            "session_id": session_id,
+            "line_no": line_no,
+            "block_index": block_index,
+            "role": message.get("role"),
+            "type": block_type,
+            "text": block.get("text") if block_type == "text" else block.get("thinking"),
+            "tool_use_id": tool_use_id,
+        }
+        if block_type == "tool_use":
+            yield "tool_calls", {
+                "session_id": session_id,
+                "line_no": line_no,
+                "tool_use_id": tool_use_id,
+                "name": block.get("name"),
+                "input": json.dumps(block.get("input")),
+                "timestamp": timestamp,
+            }
+        elif block_type == "tool_result":
+            yield "tool_results", {
+                "session_id": session_id,
+                "line_no": line_no,
+                "tool_use_id": tool_use_id,
+                "content": _result_text(block.get("content")),
+                "is_error": block.get("is_error"),
+                "timestamp": timestamp,
+            }
+
+
+class TableWriter:
+    """Write rows to one Parquet/Arrow file in row groups, via a temporary file."""
+
+    def __init__(self, path: Path, schema, fmt: str):
+        self.path = path
+        self.schema = schema
+        self.fmt = fmt
+        self.tmp = path.with_name(path.name + ".tmp")
+        self.rows: list[dict] = []
+        self.size = 0
+        self.writer = None
+
+    def add(self, row: dict):
+        self.rows.append(row)
+        self.size += sum(len(value) for value in row.values() if isinstance(value, str))
+        if len(self.rows) >= ROW_GROUP_ROWS or self.size >= ROW_GROUP_BYTES:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.writer is None:
+            self.tmp.parent.mkdir(parents=True, exist_ok=True)
+            if self.fmt == "parquet":
+                self.writer = pq.ParquetWriter(self.tmp, self.schema, compression="zstd")
+            else:
+                self.writer = pa.ipc.new_file(self.tmp, self.schema)
+        self.writer.write_table(pa.Table.from_pylist(self.rows, self.schema))
+        self.rows = []
+        self.size = 0
+
+    def close(self):
+        """Finish the file, replacing the previous export; remove it if there were no rows."""
+        self.flush()
+        if self.writer is None:
+            self.path.unlink(missing_ok=True)
+            return
+        self.writer.close()
+        self.tmp.replace(self.path)
+
+
+def export_project(project: str, sessions: list, out_dir: Path, fmt: str):
+    """Write all tables of one project from its session files."""
+    writers = {
+        table: TableWriter(out_dir / table / f"project={project}" / f"part{FORMATS[fmt]}", schema, fmt)
+        for table, schema in SCHEMAS.items()
+    }
+    for session in sorted(sessions, key=lambda s: s.id):
+        try:
+            f = open(session.path, "rb")
+        except OSError:
+            continue
+        with f:
+            for line_no, line in enumerate(iter_complete_lines(f)):
+                try:
+                    msg = loads(line)
+                except DecodeError:
+                    continue
+                if isinstance(msg, dict):
+                    for table, row in flatten(session.id, line_no, msg):
+                        writers[table].add(row)
+    for writer in writers.values():
+        writer.close()
+
+
+def export(projects_dir: Path, out_dir: Path, fmt: str = "parquet", project: str | None = None,
+           full: bool = False) -> tuple[int, int]:
+    """Export changed projects (all of them with full); returns (exported, unchanged) counts."""
+    if pa is None:
+        raise ImportError("pyarrow is not installed (uv sync --extra export)")
+    manifest_path = out_dir / MANIFEST
+    manifest = {}
+    if manifest_path.exists() and not full:
+        manifest = json.loads(manifest_path.read_text())
+    if manifest.get("version") != EXPORT_VERSION or manifest.get("format") != fmt:
+        manifest = {"version": EXPORT_VERSION, "format": fmt, "projects": {}}
+
+    by_project = {}
+    for session in scan_projects(projects_dir):
+        by_project.setdefault(session.project, []).append(session)
+    if project:
+        by_project = {name: sessions for name, sessions in by_project.items() if name == project}
+
+    exported = unchanged = 0
+    for name, sessions in sorted(by_project.items()):
+        state = {session.path: [session.mtime, session.size] for session in sessions}
+        if manifest["projects"].get(name) == state:
+            unchanged += 1
+            continue
+        export_project(name, sessions, out_dir, fmt)
+        manifest["projects"][name] = state
+        exported += 1
+        # Save after every project, so an interrupted export resumes where it stopped
+        _write_manifest(manifest_path, manifest)
+
+    if not project:
+        for name in manifest["projects"].keys() - by_project.keys():
+            # Project directory removed: drop its partitions
+            for table in SCHEMAS:
+                shutil.rmtree(out_dir / table / f"project={name}", ignore_errors=True)
+            del manifest["projects"][name]
+    _write_manifest(manifest_path, manifest)
+    return exported, unchanged
+
+
+def _write_manifest(path: Path, manifest: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(manifest))
+    tmp.replace(path)
@@ -0,0 +1,143 @@
+"""Grep session contents on all cores, without the index.
+
+Session files are searched in a process pool, newest first. Each line is
+first matched as raw bytes and only decoded when that matches; the match is
+then confirmed against the decoded message texts (prompts, replies,
+thinking, tool calls and results), which also gives the message context to
+show. Results stream back file by file and the search stops at a cap.
+
+A literal query is turned into a byte pattern that also matches its JSON
+escapes and case variants. A regex only runs on decoded text: its byte
+pattern is the longest literal string every match must contain, treated
+like a literal query, and a regex without one decodes every line.
+"""
+
+import os
+import re
+from multiprocessing import Pool
+from re import _constants as sre_constants, _parser as sre_parser
+from pathlib import Path
+
+from decode import DecodeError, decode_entry
+from history import query_pattern
+from index import message_texts
+from scan import scan_projects
+
+MAX_RESULTS = 100
+
+# Characters of message text shown on each side of a match
+CONTEXT_CHARS = 80
+
+# Regex repeats; their content is required when the minimum count is at least 1
+REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, sre_constants.POSSESSIVE_REPEAT)
+
+# Set in each worker by _init_worker()
+_prefilter: re.Pattern[bytes] | None = None
+_pattern: re.Pattern[str] | None = None
+_limit = MAX_RESULTS
+
+
+def compile_patterns(query: str, fixed: bool = False, ignore_case: bool = False):
+    """(raw line byte pattern, message text pattern) for a query; raises re.error.
+
+    The byte pattern is None when a regex has no required literal, and every
+    line has to be decoded.
+    """
+    flags = re.IGNORECASE if ignore_case else 0
+    if fixed:
+        return query_pattern(query, ignore_case), re.compile(re.escape(query), flags)
+    pattern = re.compile(query, flags)
+    parsed = sre_parser.parse(query, flags)
+    literals = _required_literals(parsed)
+    if not literals:
+        return None, pattern
+    # Inline flags such as (?i) are in the parsed global flags
+    return query_pattern(max(literals, key=len), bool(parsed.state.flags & re.IGNORECASE)), pattern
+
+
+def _required_literals(items) -> list[str]:
+    """Literal strings that every match of a parsed regex (sequence) contains."""
+    literals, run = [], []
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        literals.append("".join(run))
+        run = []
+        if op is sre_constants.SUBPATTERN and not av[1] and not av[2]:
+            # A group without scoped flags: (group, add flags, del flags, items)
+            literals += _required_literals(av[3])
+        elif op is sre_constants.ATOMIC_GROUP:
+            literals += _required_literals(av)
+        elif op in REPEATS and av[0] >= 1:
+            literals += _required_literals(av[2])
+    literals.append("".join(run))
+    return [literal for literal in literals if literal]
+
+
+def _init_worker(prefilter: re.Pattern[bytes] | None, pattern: re.Pattern[str], limit: int):
+    global _prefilter, _pattern, _limit
+    _prefilter, _pattern, _limit = prefilter, pattern, limit
+
+
+def grep_file(path: str) -> tuple[str, list[dict]]:
+    """Matching messages of one session file, at most _limit of them."""
+    hits = []
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return path, hits
+    with f:
+        for line_no, line in enumerate(f):
+            if _prefilter is not None and not _prefilter.search(line):
+                continue
+            try:
+                msg = decode_entry(line)
+            except DecodeError:
+                continue
+            for role, text in message_texts(msg):
+                match = _pattern.search(text)
+                if not match:
+                    continue
+                start = max(0, match.start() - CONTEXT_CHARS)
+                hits.append({
+                    "line_no": line_no,
+                    "timestamp": msg.get("timestamp"),
+                    "role": role,
+                    "before": text[start:match.start()],
+                    "match": match.group(),
+                    "after": text[match.end():match.end() + CONTEXT_CHARS],
+                })
+                if len(hits) >= _limit:
+                    return path, hits
+    return path, hits
+
+
+def grep_sessions(projects_dir: Path, prefilter: re.Pattern[bytes] | None, pattern: re.Pattern[str],
+                  project: str | None = None, limit: int = MAX_RESULTS, workers: int | None = None):
+    """Yield (session file, hit) as worker processes find them, at most limit in total."""
+    sessions = [s for s in scan_projects(projects_dir) if not project or project in s.project]
+    paths = [s.path for s in sorted(sessions, key=lambda s: s.mtime, reverse=True)]
+    workers = workers or os.cpu_count() or 1
+    if limit <= 0 or not paths:
+        return
+
+    count = 0
+    if workers <= 1 or len(paths) <= 1:
+        _init_worker(prefilter, pattern, limit)
+        results = map(grep_file, paths)
+        pool = None
+    else:
+        pool = Pool(min(workers, len(paths)), _init_worker, (prefilter, pattern, limit))
+        results = pool.imap_unordered(grep_file, paths)
+    try:
+        for path, hits in results:
+            for hit in hits:
+                yield Path(path), hit
+                count += 1
+                if count >= limit:
+                    return
+    finally:
+        if pool:
+            # Stops workers still searching once the cap is reached
+            pool.terminate()
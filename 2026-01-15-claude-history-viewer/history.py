@@ -0,0 +1,139 @@
+"""Search history.jsonl without decoding all of it.
+
+The file is memory-mapped and scanned backwards in chunks for the query's
+bytes, so only lines that may match are decoded, and a search for the most
+recent N matches stops as soon as it has them. The byte pattern is a
+superset of the real test (substring of the lower-cased "display" field):
+each query character also matches every character with the same lower or
+upper case form (or whose lower case form contains it, as "İ" lowers to
+"i" plus a combining dot), and their JSON escapes, and every candidate
+line is decoded and checked. A query that would have to match part of such
+a multi-character lower case form lets every line through instead.
+"""
+
+import mmap
+import re
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+
+from decode import DecodeError, loads
+
+# Bytes scanned per step, walking backwards from the end of the file
+CHUNK_SIZE = 1024 * 1024
+
+# How JSON may write characters that need escaping
+JSON_ESCAPES = {
+    '"': b'\\"',
+    "\\": b"\\\\",
+    "/": b"\\/",
+    "\b": b"\\b",
+    "\f": b"\\f",
+    "\n": b"\\n",
+    "\r": b"\\r",
+    "\t": b"\\t",
+}
+
+# Every character with a case mapping is below this code point
+CASED_LIMIT = 0x1E944
+
+# Matches at the start of every line
+EVERY_LINE = re.compile(rb"^", re.MULTILINE)
+
+
+@lru_cache(maxsize=1)
+def _case_table() -> tuple[dict[str, set[str]], set[str]]:
+    """Cased characters by each of their forms (itself, lower, upper, characters of
+    lower), and the characters that continue a multi-character lower case form."""
+    table = defaultdict(set)
+    continuations = set()
+    for code in range(CASED_LIMIT):
+        char = chr(code)
+        lower, upper = char.lower(), char.upper()
+        if lower == upper == char:
+            continue
+        for key in {char, lower, upper, *lower}:
+            table[key].add(char)
+        continuations.update(lower[1:])
+    return table, continuations
+
+
+def case_variants(char: str) -> set[str]:
+    """Characters that may match char case-insensitively, in str.lower() or re.IGNORECASE."""
+    table = _case_table()[0]
+    variants = {char}
+    # Twice, for pairs only linked through a third form ("ı" and "İ" through "i" and "I")
+    for _ in range(2):
+        for variant in list(variants):
+            for key in {variant, variant.lower(), variant.upper(), *variant.lower()}:
+                variants.update(table.get(key, ()))
+    return variants
+
+
+def _char_pattern(char: str, ignore_case: bool) -> bytes:
+    """Alternatives matching char (or its case variants), raw or JSON-escaped."""
+    alternatives = []
+    variants = sorted(case_variants(char)) if ignore_case else (char,)
+    for variant in variants:
+        alternatives.append(re.escape(variant.encode("utf-8", "surrogatepass")))
+        if variant.isascii() and variant.isprintable() and variant not in JSON_ESCAPES:
+            continue
+        if variant in JSON_ESCAPES:
+            alternatives.append(re.escape(JSON_ESCAPES[variant]))
+        # \uXXXX, as a surrogate pair beyond the BMP
+        units = variant.encode("utf-16-be", "surrogatepass")
+        escaped = b"".join(b"\\\\u" + units[i:i + 2].hex().encode() for i in range(0, len(units), 2))
+        alternatives.append(escaped)
+        if not ignore_case:
+            # Without IGNORECASE, also match upper-case hex digits
+            alternatives.append(escaped.upper().replace(b"\\\\U", b"\\\\u"))
+    return b"(?:" + b"|".join(alternatives) + b")"
+
+
+@lru_cache(maxsize=64)
+def query_pattern(query: str, ignore_case: bool = True) -> re.Pattern[bytes]:
+    """Byte pattern matching every JSON line whose text may contain query."""
+    if ignore_case and any(char in _case_table()[1] for char in query[1:]):
+        # Could be matched by one character lowering to several, e.g. "i̇" by "İ"
+        return EVERY_LINE
+    pattern = b"".join(_char_pattern(char, ignore_case) for char in query)
+    return re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+
+
+def search_history_file(history_file: Path, query: str, limit: int) -> list[dict]:
+    """The most recent limit entries whose "display" contains query, newest first."""
+    query = query.lower()
+    pattern = query_pattern(query)
+    matches = []
+    try:
+        f = open(history_file, "rb")
+    except OSError:
+        return matches
+    with f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            return matches
+        with mm:
+            end = len(mm)
+            while end > 0 and len(matches) < limit:
+                # Start the chunk at a line boundary, so no match spans two chunks
+                start = mm.rfind(b"\n", 0, max(0, end - CHUNK_SIZE)) + 1
+                lines = {}  # line start -> end, in file order
+                for match in pattern.finditer(mm, start, end):
+                    line_start = mm.rfind(b"\n", start, match.start()) + 1 or start
+                    if line_start not in lines:
+                        line_end = mm.find(b"\n", match.end(), end)
+                        lines[line_start] = end if line_end == -1 else line_end
+                for line_start, line_end in reversed(lines.items()):
+                    try:
+                        entry = loads(mm[line_start:line_end])
+                    except DecodeError:
+                        continue
+                    if isinstance(entry, dict) and query in entry.get("display", "").lower():
+                        matches.append(entry)
+                        if len(matches) == limit:
+                            break
+                end = start - 1 if start else 0
+    return matches
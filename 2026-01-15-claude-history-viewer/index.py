@@ -0,0 +1,486 @@
+"""Persistent SQLite index of Claude Code session metadata.
+
+Scanning ~/.claude/projects and re-parsing every JSONL file on each request
+gets slow once there are thousands of sessions. The index stores per-session
+metadata and is refreshed incrementally: refresh() only records mtime and
+size, and sessions are parsed when something needs their contents (search,
+the session view), resuming from the last indexed byte if the file only grew.
+Listing previews come from a cheap byte-level scan instead of a full parse.
+
+Message text (prompts, replies, thinking, tool inputs and results) also goes
+into an FTS5 table for full-text search, and the byte offset of every JSONL
+line is recorded so a page of a large session can be read by seeking.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from decode import DecodeError, decode_entry, iter_complete_lines
+from scan import SCAN_WORKERS, scan_project, scan_projects
+
+CACHE_DIR = Path.home() / ".cache" / "claude-history"
+
+# Seconds to wait for another process's write lock (web.py serve workers share the index)
+BUSY_TIMEOUT = 60.0
+
+# Longest preview any caller displays (main.py uses 60, web.py uses 100)
+PREVIEW_CHARS = 200
+
+# Bump when SCHEMA changes; the index is only a cache and gets rebuilt
+SCHEMA_VERSION = 3
+TABLES = ("sessions", "messages", "messages_fts", "lines", "project_paths")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    path TEXT PRIMARY KEY,
+    id TEXT NOT NULL,
+    project TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    indexed_bytes INTEGER NOT NULL DEFAULT 0,
+    line_count INTEGER NOT NULL DEFAULT 0,
+    preview TEXT NOT NULL DEFAULT '',
+    user_count INTEGER NOT NULL DEFAULT 0,
+    assistant_count INTEGER NOT NULL DEFAULT 0,
+    tool_result_count INTEGER NOT NULL DEFAULT 0,
+    first_timestamp TEXT,
+    last_timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS sessions_id ON sessions (id);
+CREATE INDEX IF NOT EXISTS sessions_project ON sessions (project, mtime DESC);
+
+CREATE TABLE IF NOT EXISTS messages (
+    rowid INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    project TEXT NOT NULL,
+    role TEXT NOT NULL,
+    timestamp TEXT,
+    offset INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_path ON messages (path);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(text, tokenize = 'unicode61');
+
+CREATE TABLE IF NOT EXISTS lines (
+    path TEXT NOT NULL,
+    line_no INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    PRIMARY KEY (path, line_no)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS project_paths (
+    encoded TEXT PRIMARY KEY,
+    decoded TEXT NOT NULL
+);
+"""
+
+# Line types shown in the session view (see _line_type)
+MESSAGE_TYPES = ("user", "assistant", "tool_result")
+
+# Parse state of a session before its first line is indexed
+EMPTY_META = {
+    "indexed_bytes": 0,
+    "line_count": 0,
+    "preview": "",
+    "user_count": 0,
+    "assistant_count": 0,
+    "tool_result_count": 0,
+    "first_timestamp": None,
+    "last_timestamp": None,
+}
+
+# Raw-byte checks for extract_preview(). Quotes inside JSON strings are
+# escaped, so these only match real keys.
+USER_LINE = re.compile(rb'"type"\s*:\s*"user"')
+STRING_CONTENT = re.compile(rb'"content"\s*:\s*"')
+TOOL_RESULT = re.compile(rb'"type"\s*:\s*"tool_result"')
+
+# snippet() markers around matched terms; callers replace them for display
+MATCH_START = "\x02"
+MATCH_END = "\x03"
+
+
+def cache_dir(projects_dir: Path) -> Path:
+    """Cache directory for the databases of one projects directory.
+
+    Syncing a database drops the rows of sessions outside its projects
+    directory, so a server and a CLI reading different CLAUDE_DIRs must not
+    share one.
+    """
+    return CACHE_DIR / hashlib.sha1(str(projects_dir.resolve()).encode()).hexdigest()[:12]
+
+
+class SessionIndex:
+    """Session metadata cached in SQLite, keyed by session file path."""
+
+    def __init__(self, projects_dir: Path, db_path: Path | None = None, scan_workers: int = SCAN_WORKERS):
+        self.projects_dir = projects_dir
+        self.db_path = db_path or cache_dir(projects_dir) / "index.db"
+        self.scan_workers = scan_workers
+        self._local = threading.local()
+        self._last_refresh = 0.0
+        # SQLite connections must not be used across fork(); forked server workers open their own
+        os.register_at_fork(after_in_child=self._reset_connections)
+
+    def _reset_connections(self):
+        self._local = threading.local()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Per-thread connection (Flask serves requests from several threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript("".join(f"DROP TABLE IF EXISTS {table};" for table in TABLES))
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def refresh(self, min_interval: float = 0.0, project: str | None = None):
+        """Sync the index with the files on disk.
+
+        Only stats files: new and changed sessions get their mtime and size
+        recorded and are parsed later, when their contents are needed.
+        With min_interval, skip the scan if the last one was that recent.
+        With project (an encoded directory name), only that project is scanned.
+        """
+        if project is not None:
+            sessions = scan_project(str(self.projects_dir / project))
+            rows = self.conn.execute("SELECT path, mtime, size FROM sessions WHERE project = ?", (project,))
+        else:
+            now = time.monotonic()
+            if self._last_refresh and now - self._last_refresh < min_interval:
+                return
+            self._last_refresh = now
+
+            if not self.projects_dir.exists():
+                return
+            sessions = scan_projects(self.projects_dir, self.scan_workers)
+            rows = self.conn.execute("SELECT path, mtime, size FROM sessions")
+
+        on_disk = {session.path: (session.project, session.mtime, session.size) for session in sessions}
+        indexed = {row["path"]: (row["mtime"], row["size"]) for row in rows}
+
+        conn = self.conn
+        with conn:
+            for path in indexed.keys() - on_disk.keys():
+                self._delete_session(path)
+
+            for path, (project, mtime, size) in on_disk.items():
+                if indexed.get(path) != (mtime, size):
+                    self._record_stat(path, project, mtime, size)
+
+    def _record_stat(self, path: str, project: str, mtime: float, size: int):
+        self.conn.execute(
+            """
+            INSERT INTO sessions (path, id, project, mtime, size) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (path) DO UPDATE SET mtime = excluded.mtime, size = excluded.size
+            """,
+            (path, Path(path).stem, project, mtime, size),
+        )
+
+    def _delete_session(self, path: str):
+        self.conn.execute("DELETE FROM sessions WHERE path = ?", (path,))
+        self._delete_messages(path)
+
+    def parse_pending(self, path: str | None = None):
+        """Parse sessions (or one session) with bytes not yet indexed.
+
+        Each session is read without holding the write lock and stored in its
+        own transaction, so parsing a cold index doesn't block other
+        processes' writes for its whole duration.
+        """
+        conn = self.conn
+        query = "SELECT * FROM sessions WHERE indexed_bytes != size AND (:path IS NULL OR path = :path)"
+        for row in conn.execute(query, {"path": path}).fetchall():
+            parsed = self._read_session(row)
+            if parsed is None:
+                continue
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                # Another process may have indexed these bytes while we read them
+                current = conn.execute("SELECT indexed_bytes FROM sessions WHERE path = ?", (row["path"],)).fetchone()
+                if current and current["indexed_bytes"] == row["indexed_bytes"]:
+                    self._store_session(*parsed)
+
+    def _read_session(self, row: sqlite3.Row) -> tuple | None:
+        """Parse a session file, resuming from the last indexed byte if it only grew.
+
+        Returns (meta, rewritten, texts, lines) for _store_session(), or None
+        if the file can't be read.
+        """
+        meta = dict(row)
+        path = Path(meta["path"])
+        rewritten = meta["size"] < meta["indexed_bytes"]
+        if rewritten:
+            # Shrunk, so it was rewritten rather than appended to
+            meta.update(EMPTY_META)
+
+        texts = []  # (role, timestamp, offset, text)
+        lines = []  # (line_no, offset, length, type)
+        try:
+            with open(path, "rb") as f:
+                f.seek(meta["indexed_bytes"])
+                for line in iter_complete_lines(f):
+                    offset = meta["indexed_bytes"]
+                    meta["indexed_bytes"] += len(line)
+                    try:
+                        msg = decode_entry(line)
+                    except DecodeError:
+                        continue
+                    lines.append((meta["line_count"], offset, len(line), _line_type(msg)))
+                    meta["line_count"] += 1
+                    _update_meta(meta, msg)
+                    for role, text in message_texts(msg):
+                        texts.append((role, msg.get("timestamp"), offset, text))
+        except OSError:
+            return None
+        return meta, rewritten, texts, lines
+
+    def _store_session(self, meta: dict, rewritten: bool, texts: list[tuple], lines: list[tuple]):
+        """Write the result of _read_session(); the caller holds the transaction."""
+        conn = self.conn
+        if rewritten:
+            self._delete_messages(meta["path"])
+        assignments = ", ".join(f"{k} = :{k}" for k in EMPTY_META)
+        conn.execute(f"UPDATE sessions SET {assignments} WHERE path = :path", meta)
+        for role, timestamp, offset, text in texts:
+            cur = conn.execute(
+                "INSERT INTO messages (path, project, role, timestamp, offset) VALUES (?, ?, ?, ?, ?)",
+                (meta["path"], meta["project"], role, timestamp, offset),
+            )
+            conn.execute("INSERT INTO messages_fts (rowid, text) VALUES (?, ?)", (cur.lastrowid, text))
+        conn.executemany(
+            "INSERT OR REPLACE INTO lines (path, line_no, offset, length, type) VALUES (?, ?, ?, ?, ?)",
+            [(meta["path"], *line) for line in lines],
+        )
+
+    def _delete_messages(self, path: str):
+        """Drop a session's rows from the full-text and line indexes."""
+        self.conn.execute(
+            "DELETE FROM messages_fts WHERE rowid IN (SELECT rowid FROM messages WHERE path = ?)", (path,)
+        )
+        self.conn.execute("DELETE FROM messages WHERE path = ?", (path,))
+        self.conn.execute("DELETE FROM lines WHERE path = ?", (path,))
+
+    def update(self, path: Path) -> sqlite3.Row | None:
+        """Bring a single session up to date, parsing it, and return its row."""
+        conn = self.conn
+        try:
+            st = path.stat()
+        except OSError:
+            with conn:
+                self._delete_session(str(path))
+            return None
+        row = conn.execute("SELECT mtime, size FROM sessions WHERE path = ?", (str(path),)).fetchone()
+        # Only take the write lock when the file changed
+        if row is None or (row["mtime"], row["size"]) != (st.st_mtime, st.st_size):
+            with conn:
+                self._record_stat(str(path), path.parent.name, st.st_mtime, st.st_size)
+        self.parse_pending(str(path))
+        return conn.execute("SELECT * FROM sessions WHERE path = ?", (str(path),)).fetchone()
+
+    def message_lines(self, path: Path, start: int = 0, limit: int | None = None) -> list[sqlite3.Row]:
+        """Offsets of the displayable lines of a session, from line number start."""
+        return self.conn.execute(
+            f"""
+            SELECT line_no, offset, length, type FROM lines
+            WHERE path = ? AND line_no >= ? AND type IN ({", ".join("?" * len(MESSAGE_TYPES))})
+            ORDER BY line_no LIMIT ?
+            """,
+            (str(path), start, *MESSAGE_TYPES, -1 if limit is None else limit),
+        ).fetchall()
+
+    def projects(self) -> list[sqlite3.Row]:
+        """Projects with session count and latest mtime, most recent first."""
+        return self.conn.execute(
+            """
+            SELECT project, COUNT(*) AS session_count, MAX(mtime) AS latest
+            FROM sessions GROUP BY project ORDER BY latest DESC
+            """
+        ).fetchall()
+
+    def sessions(
+        self, project: str, before: tuple[float, str] | None = None, limit: int | None = None
+    ) -> list[sqlite3.Row]:
+        """Sessions of a project, most recent first, with previews filled in.
+
+        before is the (mtime, id) of the last session of the previous page;
+        paging on it rather than an offset stays stable while sessions are
+        added or touched, and is an index range scan however deep the page.
+        """
+        conn = self.conn
+        query = "SELECT * FROM sessions WHERE project = ?"
+        params: tuple = (project,)
+        if before:
+            query += " AND (mtime < ? OR (mtime = ? AND id < ?))"
+            params += (before[0], before[0], before[1])
+        query += " ORDER BY mtime DESC, id DESC LIMIT ?"
+        params += (-1 if limit is None else limit,)
+        rows = conn.execute(query, params).fetchall()
+
+        missing = [row for row in rows if not row["preview"] and row["size"]]
+        previews = [(extract_preview(row["path"], row["mtime"], row["size"]), row["path"]) for row in missing]
+        previews = [(preview, path) for preview, path in previews if preview]
+        if previews:
+            with conn:
+                conn.executemany("UPDATE sessions SET preview = ? WHERE path = ?", previews)
+            rows = conn.execute(query, params).fetchall()
+        return rows
+
+    def fingerprint(self, project: str | None = None) -> tuple[int, float | None, int | None]:
+        """(session count, latest mtime, total size) of all sessions or one project.
+
+        Changes whenever a session is added, removed or written to.
+        """
+        return tuple(
+            self.conn.execute(
+                "SELECT COUNT(*), MAX(mtime), SUM(size) FROM sessions WHERE :project IS NULL OR project = :project",
+                {"project": project},
+            ).fetchone()
+        )
+
+    def project_path(self, encoded: str) -> str | None:
+        """Cached decoding of an encoded project directory name."""
+        row = self.conn.execute("SELECT decoded FROM project_paths WHERE encoded = ?", (encoded,)).fetchone()
+        return row["decoded"] if row else None
+
+    def cache_project_path(self, encoded: str, decoded: str):
+        """Remember a project path decoding across restarts."""
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO project_paths (encoded, decoded) VALUES (?, ?)", (encoded, decoded)
+            )
+
+    def search(
+        self,
+        query: str,
+        project: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        limit: int = 50,
+    ) -> list[sqlite3.Row]:
+        """Full-text search over message bodies, best match first.
+
+        query uses FTS5 syntax ("exact phrase", AND/OR/NOT, prefix*). If it
+        doesn't parse, each word is searched as a literal term instead.
+        project matches as a substring of the encoded project name.
+        since/until are ISO dates compared against message timestamps.
+        """
+        self.parse_pending()
+        sql = f"""
+            SELECT m.path, m.project, m.role, m.timestamp, m.offset, s.id AS session_id,
+                   snippet(messages_fts, 0, '{MATCH_START}', '{MATCH_END}', '…', 16) AS snippet
+            FROM messages_fts
+            JOIN messages m ON m.rowid = messages_fts.rowid
+            JOIN sessions s ON s.path = m.path
+            WHERE messages_fts MATCH :query
+              AND (:project IS NULL OR instr(m.project, :project) > 0)
+              AND (:since IS NULL OR m.timestamp >= :since)
+              AND (:until IS NULL OR m.timestamp < :until)
+            ORDER BY bm25(messages_fts)
+            LIMIT :limit
+        """
+        params = {"query": query, "project": project, "since": since, "until": until, "limit": limit}
+        try:
+            return self.conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError:
+            params["query"] = " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+            return self.conn.execute(sql, params).fetchall()
+
+
+@lru_cache(maxsize=4096)
+def extract_preview(path: str, mtime: float, size: int) -> str:
+    """First string user prompt of a session, truncated to PREVIEW_CHARS.
+
+    mtime and size only key the cache. Lines are decoded only when their raw
+    bytes look like a user prompt, so large tool results and summaries before
+    the first prompt cost a regex scan rather than a JSON decode.
+    """
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                if not USER_LINE.search(line) or not STRING_CONTENT.search(line) or TOOL_RESULT.search(line):
+                    continue
+                try:
+                    msg = decode_entry(line)
+                except DecodeError:
+                    continue
+                if msg.get("type") == "user":
+                    content = msg.get("message", {}).get("content", "")
+                    if isinstance(content, str):
+                        return content[:PREVIEW_CHARS]
+    except OSError:
+        pass
+    return ""
+
+
+def message_texts(msg: dict):
+    """Yield (role, text) for the searchable parts of one JSONL entry."""
+    msg_type = msg.get("type")
+    content = msg.get("message", {}).get("content", "")
+
+    if msg_type == "user":
+        if isinstance(content, str):
+            yield "user", content
+            return
+        for item in content:
+            if isinstance(item, dict) and item.get("type") == "tool_result":
+                result = item.get("content", "")
+                if isinstance(result, list):
+                    result = "\n".join(part.get("text", "") for part in result if isinstance(part, dict))
+                if result:
+                    yield "tool_result", str(result)
+
+    elif msg_type == "assistant":
+        for block in content:
+            block_type = block.get("type")
+            if block_type == "text":
+                yield "assistant", block.get("text", "")
+            elif block_type == "thinking":
+                yield "thinking", block.get("thinking", "")
+            elif block_type == "tool_use":
+                yield "tool_use", block.get("name", "") + " " + json.dumps(block.get("input", {}))
+
+
+def _line_type(msg: dict) -> str:
+    """Classify a JSONL entry; tool results are user entries with list content."""
+    msg_type = msg.get("type") or "unknown"
+    if msg_type == "user" and not isinstance(msg.get("message", {}).get("content", ""), str):
+        return "tool_result"
+    return msg_type
+
+
+def _update_meta(meta: dict, msg: dict):
+    """Fold one JSONL entry into the session metadata."""
+    msg_type = msg.get("type")
+    timestamp = msg.get("timestamp")
+    if timestamp:
+        meta["first_timestamp"] = meta["first_timestamp"] or timestamp
+        meta["last_timestamp"] = timestamp
+
+    if msg_type == "user":
+        content = msg.get("message", {}).get("content", "")
+        if isinstance(content, str):
+            meta["user_count"] += 1
+            if not meta["preview"]:
+                meta["preview"] = content[:PREVIEW_CHARS]
+        else:
+            meta["tool_result_count"] += sum(
+                1 for item in content if isinstance(item, dict) and item.get("type") == "tool_result"
+            )
+    elif msg_type == "assistant":
+        meta["assistant_count"] += 1
@@ -0,0 +1,97 @@
+"""Resolve (partial) session ids to session files without globbing every project."""
+
+import bisect
+import os
+import threading
+from pathlib import Path
+
+
+class AmbiguousSessionId(LookupError):
+    """A partial session id matches more than one session."""
+
+    def __init__(self, prefix: str, matches: list[str]):
+        super().__init__(f"Ambiguous session id {prefix!r}: {len(matches)} matches")
+        self.prefix = prefix
+        self.matches = matches
+
+
+class SessionLookup:
+    """Cached session id -> (file, encoded project) map.
+
+    Each project directory's listing is cached together with its mtime, which
+    changes whenever a session file is created or removed. An exact id that is
+    already cached costs one stat; misses and partial ids re-stat the project
+    directories and re-list only those that changed. Partial ids are resolved
+    by bisecting a sorted list of ids.
+    """
+
+    def __init__(self, projects_dir: Path):
+        self.projects_dir = projects_dir
+        self._lock = threading.Lock()
+        self._dir_mtimes: dict[str, float] = {}
+        self._dir_sessions: dict[str, dict[str, Path]] = {}
+        self._sessions: dict[str, tuple[Path, str]] = {}
+        self._sorted_ids: list[str] = []
+
+    def resolve(self, session_id: str) -> tuple[Path, str] | None:
+        """Return (session file, encoded project), or None if not found.
+
+        Raises AmbiguousSessionId if a partial id matches several sessions.
+        """
+        found = self._sessions.get(session_id)
+        if found and found[0].exists():
+            return found
+
+        self._revalidate()
+        found = self._sessions.get(session_id)
+        if found:
+            return found
+
+        matches = self.complete(session_id)
+        if len(matches) > 1:
+            raise AmbiguousSessionId(session_id, matches)
+        return self._sessions[matches[0]] if matches else None
+
+    def complete(self, prefix: str) -> list[str]:
+        """All cached session ids starting with prefix."""
+        ids = self._sorted_ids
+        start = bisect.bisect_left(ids, prefix)
+        end = start
+        while end < len(ids) and ids[end].startswith(prefix):
+            end += 1
+        return ids[start:end]
+
+    def _revalidate(self):
+        """Re-list project directories whose mtime changed since the last call."""
+        with self._lock:
+            if not self.projects_dir.exists():
+                return
+            changed = False
+            seen = set()
+            for project_dir in os.scandir(self.projects_dir):
+                if not project_dir.is_dir():
+                    continue
+                seen.add(project_dir.name)
+                mtime = project_dir.stat().st_mtime
+                if self._dir_mtimes.get(project_dir.name) == mtime:
+                    continue
+                self._dir_mtimes[project_dir.name] = mtime
+                self._dir_sessions[project_dir.name] = {
+                    entry.name.removesuffix(".jsonl"): Path(entry.path)
+                    for entry in os.scandir(project_dir.path)
+                    if entry.name.endswith(".jsonl")
+                }
+                changed = True
+
+            for name in self._dir_sessions.keys() - seen:
+                del self._dir_sessions[name]
+                del self._dir_mtimes[name]
+                changed = True
+
+            if changed:
+                self._sessions = {
+                    session_id: (path, project)
+                    for project, sessions in self._dir_sessions.items()
+                    for session_id, path in sessions.items()
+                }
+                self._sorted_ids = sorted(self._sessions)
@@ -3,20 +3,35 @@
 
 import json
 import argparse
+import os
+import re
 from pathlib import Path
 from datetime import datetime
 
-CLAUDE_DIR = Path.home() / ".claude"
+from decode import decode_entry
+from export import FORMATS, export
+from grep import MAX_RESULTS, compile_patterns, grep_sessions
+from history import search_history_file
+from index import MATCH_END, MATCH_START, SessionIndex
+from lookup import AmbiguousSessionId, SessionLookup
+from paths import decode_project_path
+from publish import FORMATS as PUBLISH_FORMATS, publish
+from scan import project_names
+from stats import USAGE_FIELDS, SessionStats, format_duration
+
+CLAUDE_DIR = Path(os.environ.get("CLAUDE_DIR") or Path.home() / ".claude")
 PROJECTS_DIR = CLAUDE_DIR / "projects"
 
+session_index = SessionIndex(PROJECTS_DIR)
+session_lookup = SessionLookup(PROJECTS_DIR)
+
 
 def list_projects():
     """List all projects with sessions."""
     for project_dir in sorted(PROJECTS_DIR.iterdir()):
         if project_dir.is_dir():
             sessions = list(project_dir.glob("*.jsonl"))
-            # Decode path: -home-user-code becomes /home/user/code
-            decoded = "/" + project_dir.name.replace("-", "/")
+            decoded = decode_project_path(project_dir.name, session_index)
             print(f"{decoded}  ({len(sessions)} sessions)")
 
 
@@ -24,57 +39,44 @@ def list_sessions(project_path: str):
     """List sessions for a project."""
     # Encode path: /home/user/code becomes -home-user-code
     encoded = project_path.replace("/", "-").lstrip("-")
-    project_dir = PROJECTS_DIR / encoded
+    projects = project_names(PROJECTS_DIR)
 
-    if not project_dir.exists():
+    if encoded not in projects:
         # Try partial match
-        matches = [p for p in PROJECTS_DIR.iterdir() if encoded in p.name]
+        matches = [p for p in projects if encoded in p]
         if matches:
-            project_dir = matches[0]
+            encoded = matches[0]
         else:
             print(f"Project not found: {project_path}")
             return
 
-    sessions = sorted(project_dir.glob("*.jsonl"), key=lambda p: p.stat().st_mtime, reverse=True)
-    for session_file in sessions:
-        mtime = datetime.fromtimestamp(session_file.stat().st_mtime)
-        size_kb = session_file.stat().st_size // 1024
-
-        # Get first user message as preview
-        preview = ""
-        with open(session_file) as f:
-            for line in f:
-                msg = json.loads(line)
-                if msg.get("type") == "user":
-                    content = msg.get("message", {}).get("content", "")
-                    if isinstance(content, str):
-                        preview = content[:60].replace("\n", " ")
-                        break
-
-        print(f"{session_file.stem}  {mtime:%Y-%m-%d %H:%M}  {size_kb:>4}KB  {preview}...")
+    # Only this project's directory is scanned
+    session_index.refresh(project=encoded)
+    for session in session_index.sessions(encoded):
+        mtime = datetime.fromtimestamp(session["mtime"])
+        size_kb = session["size"] // 1024
+        preview = session["preview"][:60].replace("\n", " ")
+        print(f"{session['id']}  {mtime:%Y-%m-%d %H:%M}  {size_kb:>4}KB  {preview}...")
 
 
 def print_session(session_id: str, show_thinking: bool = False, show_tools: bool = False):
     """Pretty print a session's conversation."""
-    # Find the session file
-    session_file = None
-    for project_dir in PROJECTS_DIR.iterdir():
-        candidate = project_dir / f"{session_id}.jsonl"
-        if candidate.exists():
-            session_file = candidate
-            break
-        # Try partial match
-        for f in project_dir.glob(f"{session_id}*.jsonl"):
-            session_file = f
-            break
+    try:
+        found = session_lookup.resolve(session_id)
+    except AmbiguousSessionId as e:
+        print(f"Ambiguous session id: {session_id}")
+        for match in e.matches:
+            print(f"  {match}")
+        return
 
-    if not session_file:
+    if not found:
         print(f"Session not found: {session_id}")
         return
+    session_file, _ = found
 
-    with open(session_file) as f:
+    with open(session_file, "rb") as f:
         for line in f:
-            msg = json.loads(line)
+            msg = decode_entry(line)
             msg_type = msg.get("type")
 
             if msg_type == "user":
@@ -116,22 +118,129 @@ def search_history(query: str, limit: int = 20):
         print("history.jsonl not found")
         return
 
-    matches = []
-    with open(history_file) as f:
-        for line in f:
-            entry = json.loads(line)
-            display = entry.get("display", "")
-            if query.lower() in display.lower():
-                matches.append(entry)
-
-    # Show most recent first
-    for entry in matches[-limit:]:
+    # Show most recent last
+    for entry in reversed(search_history_file(history_file, query, limit)):
         ts = datetime.fromtimestamp(entry.get("timestamp", 0) / 1000)
         session = entry.get("sessionId", "")[:8]
         display = entry.get("display", "")[:80].replace("\n", " ")
         print(f"{ts:%Y-%m-%d %H:%M}  {session}  {display}")
 
 
+def search_sessions(query: str, limit: int = 20, project: str | None = None,
+                    since: str | None = None, until: str | None = None):
+    """Full-text search over all session messages via the index."""
+    session_index.refresh()
+    if project:
+        # Accept a path or a partial name like list_sessions does
+        project = project.replace("/", "-")
+    rows = session_index.search(query, project=project, since=since, until=until, limit=limit)
+
+    for row in rows:
+        ts = datetime.fromisoformat(row["timestamp"]).astimezone() if row["timestamp"] else None
+        date = f"{ts:%Y-%m-%d %H:%M}" if ts else " " * 16
+        snippet = row["snippet"].replace(MATCH_START, "[").replace(MATCH_END, "]").replace("\n", " ")
+        print(f"{date}  {row['session_id'][:8]}  {row['role']:<11}  {snippet}")
+
+
+def grep(query: str, fixed: bool = False, ignore_case: bool = False, project: str | None = None,
+         limit: int = MAX_RESULTS, workers: int | None = None):
+    """Search all session files in parallel, printing matches as they are found."""
+    try:
+        prefilter, pattern = compile_patterns(query, fixed, ignore_case)
+    except re.error as e:
+        print(f"Invalid pattern: {e}")
+        return
+    if project:
+        # Accept a path or a partial name like list_sessions does
+        project = project.replace("/", "-")
+
+    for session_file, hit in grep_sessions(PROJECTS_DIR, prefilter, pattern, project, limit, workers):
+        ts = datetime.fromisoformat(hit["timestamp"]).astimezone() if hit["timestamp"] else None
+        date = f"{ts:%Y-%m-%d %H:%M}" if ts else " " * 16
+        excerpt = f"{hit['before']}[{hit['match']}]{hit['after']}".replace("\n", " ")
+        print(f"{date}  {session_file.stem[:8]}  {hit['role']:<11}  {excerpt}", flush=True)
+
+
+def publish_sessions(out_dir: str, fmt: str = "html", project: str | None = None, force: bool = False,
+                     workers: int | None = None):
+    """Render sessions to static HTML/Markdown files under out_dir."""
+    if project:
+        # Accept a path or a partial name like list_sessions does
+        project = project.replace("/", "-")
+
+    def decode_path(encoded: str) -> str:
+        return decode_project_path(encoded, session_index)
+
+    written, up_to_date = publish(PROJECTS_DIR, Path(out_dir), decode_path, fmt, project, force, workers)
+    print(f"Wrote {written} sessions to {out_dir} ({up_to_date} up to date)")
+
+
+def find_project(project: str) -> str | None:
+    """Encoded project directory for a path or (partial) name; exact matches first."""
+    project = project.replace("/", "-")
+    projects = project_names(PROJECTS_DIR)
+    matches = [p for p in projects if p == project] or sorted(p for p in projects if project in p)
+    return matches[0] if matches else None
+
+
+def print_stats(project: str | None = None, workers: int | None = None):
+    """Token, tool and timing aggregates over all sessions or one project."""
+    session_stats = SessionStats(PROJECTS_DIR, workers=workers)
+    updated = session_stats.update()
+    if project:
+        # Accept a path or a partial name like list_sessions does
+        found = find_project(project)
+        if not found:
+            print(f"Project not found: {project}")
+            return
+        project = found
+    summary = session_stats.summary(project)
+
+    print(f"{summary['sessions']} sessions ({updated} updated)")
+    header = f"{'input':>14}{'output':>14}{'cache write':>14}{'cache read':>14}"
+
+    print(f"\nTokens by project\n{header}{'total':>14}")
+    for row in summary["projects"]:
+        counts = "".join(f"{row[field]:>14,}" for field in USAGE_FIELDS)
+        print(f"{counts}{row['total_tokens']:>14,}  {row['project']}")
+
+    print(f"\nTokens by model\n{header}{'total':>14}")
+    for row in summary["models"]:
+        counts = "".join(f"{row[field]:>14,}" for field in USAGE_FIELDS)
+        print(f"{counts}{row['total_tokens']:>14,}  {row['model']}")
+
+    print(f"\nTools by time\n{'calls':>8}{'time':>10}{'average':>10}")
+    for row in summary["tools"]:
+        average = format_duration(row["seconds"] / row["calls"]) if row["calls"] else "-"
+        print(f"{row['calls']:>8}{format_duration(row['seconds']):>10}{average:>10}  {row['name']}")
+
+    for label, noun, values in (
+        ("Turn latency", "turns", summary["turns"]),
+        ("Session duration", "sessions", summary["durations"]),
+    ):
+        print(
+            f"\n{label}: {values['count']} {noun}, total {format_duration(values['total'])}, "
+            f"median {format_duration(values['median'])}, p90 {format_duration(values['p90'])}, "
+            f"max {format_duration(values['max'])}"
+        )
+
+
+def export_sessions(out_dir: str, fmt: str = "parquet", project: str | None = None, full: bool = False):
+    """Export sessions to Parquet/Arrow tables under out_dir."""
+    if project:
+        found = find_project(project)
+        if not found:
+            print(f"Project not found: {project}")
+            return
+        project = found
+    try:
+        exported, unchanged = export(PROJECTS_DIR, Path(out_dir), fmt, project, full)
+    except ImportError as e:
+        print(e)
+        return
+    print(f"Exported {exported} projects to {out_dir} ({unchanged} unchanged)")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Browse Claude Code history")
     sub = parser.add_subparsers(dest="command")
@@ -149,6 +258,35 @@ def main():
     search = sub.add_parser("search", help="Search history")
     search.add_argument("query", help="Search term")
     search.add_argument("-n", "--limit", type=int, default=20, help="Max results")
+    search.add_argument("-f", "--full", action="store_true", help="Search session contents (full-text index)")
+    search.add_argument("-p", "--project", help="Only this project (--full)")
+    search.add_argument("--since", help="Only messages on or after this date, e.g. 2026-01-01 (--full)")
+    search.add_argument("--until", help="Only messages before this date (--full)")
+
+    grep_parser = sub.add_parser("grep", help="Search session contents in parallel (no index)")
+    grep_parser.add_argument("pattern", help="Regular expression (or literal with -F)")
+    grep_parser.add_argument("-F", "--fixed-strings", action="store_true", help="Match a literal string")
+    grep_parser.add_argument("-i", "--ignore-case", action="store_true", help="Case-insensitive")
+    grep_parser.add_argument("-p", "--project", help="Only this project")
+    grep_parser.add_argument("-n", "--limit", type=int, default=MAX_RESULTS, help="Stop after this many matches")
+    grep_parser.add_argument("-j", "--workers", type=int, help="Worker processes (default: CPU count)")
+
+    pub = sub.add_parser("publish", help="Render sessions to static HTML/Markdown files")
+    pub.add_argument("out", help="Output directory")
+    pub.add_argument("--format", choices=PUBLISH_FORMATS, default="html", help="File format (default: html)")
+    pub.add_argument("-p", "--project", help="Only this project")
+    pub.add_argument("--force", action="store_true", help="Rewrite sessions that are up to date")
+    pub.add_argument("-j", "--workers", type=int, help="Worker processes (default: CPU count)")
+
+    stats = sub.add_parser("stats", help="Token, tool and timing analytics")
+    stats.add_argument("-p", "--project", help="Only this project")
+    stats.add_argument("-j", "--workers", type=int, help="Worker processes (default: CPU count)")
+
+    exp = sub.add_parser("export", help="Export sessions to Parquet/Arrow tables")
+    exp.add_argument("out", help="Output directory")
+    exp.add_argument("--format", choices=FORMATS, default="parquet", help="File format (default: parquet)")
+    exp.add_argument("-p", "--project", help="Only this encoded project")
+    exp.add_argument("--full", action="store_true", help="Rewrite everything, not only changed projects")
 
     args = parser.parse_args()
 
@@ -159,7 +297,18 @@ def main():
     elif args.command == "show":
         print_session(args.session, args.thinking, args.tools)
     elif args.command == "search":
-        search_history(args.query, args.limit)
+        if args.full:
+            search_sessions(args.query, args.limit, args.project, args.since, args.until)
+        else:
+            search_history(args.query, args.limit)
+    elif args.command == "grep":
+        grep(args.pattern, args.fixed_strings, args.ignore_case, args.project, args.limit, args.workers)
+    elif args.command == "publish":
+        publish_sessions(args.out, args.format, args.project, args.force, args.workers)
+    elif args.command == "stats":
+        print_stats(args.project, args.workers)
+    elif args.command == "export":
+        export_sessions(args.out, args.format, args.project, args.full)
     else:
         parser.print_help()
 
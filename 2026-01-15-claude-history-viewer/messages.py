@@ -0,0 +1,52 @@
+"""Conversion of session JSONL entries into messages for display."""
+
+import json
+
+
+def parse_message(msg: dict):
+    """Convert one JSONL entry into a message for display, or None to skip it."""
+    msg_type = msg.get("type")
+
+    if msg_type == "user":
+        content = msg.get("message", {}).get("content", "")
+        if isinstance(content, str):
+            return {
+                "role": "user",
+                "content": content,
+                "timestamp": msg.get("timestamp"),
+            }
+        # Tool results - collect them
+        tool_results = []
+        for item in content:
+            if item.get("type") == "tool_result":
+                tool_results.append(item.get("content", ""))
+        if tool_results:
+            return {
+                "role": "tool_result",
+                "results": tool_results,
+                "timestamp": msg.get("timestamp"),
+            }
+
+    elif msg_type == "assistant":
+        content = msg.get("message", {}).get("content", [])
+        blocks = []
+        for block in content:
+            block_type = block.get("type")
+            if block_type == "thinking":
+                blocks.append({"type": "thinking", "content": block.get("thinking", "")})
+            elif block_type == "text":
+                blocks.append({"type": "text", "content": block.get("text", "")})
+            elif block_type == "tool_use":
+                blocks.append({
+                    "type": "tool_use",
+                    "name": block.get("name", ""),
+                    "input": json.dumps(block.get("input", {}), indent=2),
+                })
+        if blocks:
+            return {
+                "role": "assistant",
+                "blocks": blocks,
+                "timestamp": msg.get("timestamp"),
+            }
+
+    return None
@@ -0,0 +1,78 @@
+"""Decoding of encoded project directory names (shared by the CLI, web UI and publishing)."""
+
+from functools import cache
+from pathlib import Path
+
+from index import SessionIndex
+
+# Decodings that could not be fully validated on disk; kept per process only
+_decoded_paths: dict[str, str] = {}
+
+
+def decode_project_path(encoded: str, session_index: SessionIndex | None = None) -> str:
+    """Decode an encoded project path back to the original filesystem path.
+
+    Claude encodes paths like /home/user/my-project as -home-user-my-project.
+    We can't naively replace all hyphens with slashes because hyphens may be
+    part of actual directory names. Instead, we try all possible interpretations
+    and pick the one that matches the most path components on the filesystem.
+
+    Subproblems and is_dir() probes are memoized, so this is polynomial rather
+    than exponential in the number of hyphens. Decodings where every component
+    exists are stored in session_index, when given, and never probed again.
+    """
+    if not encoded.startswith("-"):
+        return "/" + encoded.replace("-", "/")
+
+    decoded = _decoded_paths.get(encoded) or (session_index is not None and session_index.project_path(encoded))
+    if decoded:
+        return decoded
+
+    # Remove leading hyphen
+    parts = encoded[1:].split("-")
+
+    @cache
+    def is_dir(path: Path) -> bool:
+        return path.is_dir()
+
+    @cache
+    def find_best_path(idx: int, current_path: Path) -> tuple[int, int, tuple[str, ...]]:
+        """Find the best interpretation of parts[idx:] below current_path.
+
+        Returns (validated_count, total_count, path_parts) where:
+        - validated_count: number of components that exist as directories
+        - total_count: total number of path components
+        Lower total_count is better when validated_count is equal (prefer fewer unvalidated parts).
+        current_path is always an existing directory (or /), so there are few
+        distinct (idx, current_path) states to memoize.
+        """
+        if idx >= len(parts):
+            return (0, 0, ())
+
+        best = None  # (validated, total, parts)
+
+        # Try joining parts[idx:end+1] as a single path component
+        for end in range(idx, len(parts)):
+            component = "-".join(parts[idx:end + 1])
+            test_path = current_path / component
+            is_valid = is_dir(test_path)
+
+            # Remaining path continues from the deepest validated directory
+            sub_validated, sub_total, sub_parts = find_best_path(end + 1, test_path if is_valid else current_path)
+
+            validated = (1 if is_valid else 0) + sub_validated
+            total = 1 + sub_total
+
+            # Prefer: more validated, then fewer total parts
+            if best is None or (validated, -total) > (best[0], -best[1]):
+                best = (validated, total, (component,) + sub_parts)
+
+        return best if best else (0, 0, ())
+
+    validated, total, path_parts = find_best_path(0, Path("/"))
+    decoded = "/" + "/".join(path_parts)
+    if validated == total and session_index is not None:
+        session_index.cache_project_path(encoded, decoded)
+    else:
+        _decoded_paths[encoded] = decoded
+    return decoded
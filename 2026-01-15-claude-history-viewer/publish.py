@@ -0,0 +1,177 @@
+"""Render sessions to static HTML or Markdown files for sharing.
+
+Sessions are rendered with the viewer's own templates (_messages.html, in
+a standalone page with the stylesheet inlined) in a process pool, one file
+per session under out/<project>/, plus an index. Outputs take the mtime of
+their session file, and a session is skipped when its output is not older.
+
+Tool outputs are often repeated verbatim (the same file read, the same
+test run). Each distinct output is written once; later copies refer to it
+by content hash and are filled in by a few lines of JS (or named in the
+Markdown), which keeps exports of long sessions small.
+
+HTML pages have their markdown rendered here rather than by marked.js in
+the browser, so they read the same offline.
+"""
+
+import hashlib
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import mistune
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup
+
+from decode import DecodeError, decode_entry, iter_complete_lines
+from messages import parse_message
+from scan import scan_projects
+
+APP_DIR = Path(__file__).parent
+FORMATS = {"html": ".html", "md": ".md"}
+
+# Sessions per task sent to a worker process
+CHUNK_SIZE = 4
+
+
+def fence(text: str, lang: str = "") -> str:
+    """Markdown code block around text, with a fence longer than any backtick run in it."""
+    longest = max((len(run) for run in re.findall(r"`+", text)), default=0)
+    marker = "`" * max(3, longest + 1)
+    return f"{marker}{lang}\n{text}\n{marker}"
+
+
+env = Environment(
+    loader=FileSystemLoader(APP_DIR / "templates"),
+    autoescape=select_autoescape(["html"]),
+    keep_trailing_newline=True,
+)
+env.filters["fence"] = fence
+
+# GitHub-flavoured like marked.js in the web UI, but raw HTML in messages is escaped
+markdown = mistune.create_markdown(escape=True, plugins=["table", "strikethrough", "url"])
+
+
+def dedupe_results(messages: list[dict]):
+    """Replace repeated tool outputs by references to their first occurrence.
+
+    The first copy of an output that occurs more than once becomes
+    {"id", "text"}, later copies {"ref"}, both keyed by a content hash.
+    """
+    def digest(text) -> str:
+        return "r" + hashlib.sha1(str(text).encode()).hexdigest()[:12]
+
+    counts = Counter(digest(r) for m in messages if m["role"] == "tool_result" for r in m["results"])
+    seen = set()
+    for message in messages:
+        if message["role"] != "tool_result":
+            continue
+        results = []
+        for result in message["results"]:
+            key = digest(result)
+            if key in seen:
+                results.append({"ref": key})
+            elif counts[key] > 1:
+                seen.add(key)
+                results.append({"id": key, "text": str(result)})
+            else:
+                results.append(result)
+        message["results"] = results
+
+
+def render_markdown(messages: list[dict]):
+    """Replace user prompts and assistant text blocks by their rendered HTML."""
+    for message in messages:
+        if message["role"] == "user":
+            message["content"] = Markup(markdown(message["content"]))
+        elif message["role"] == "assistant":
+            for block in message["blocks"]:
+                if block["type"] == "text":
+                    block["content"] = Markup(markdown(block["content"]))
+
+
+def read_messages(path: str) -> list[dict]:
+    """All display messages of a session file."""
+    messages = []
+    with open(path, "rb") as f:
+        for line in iter_complete_lines(f):
+            try:
+                msg = decode_entry(line)
+            except DecodeError:
+                continue
+            message = parse_message(msg)
+            if message:
+                messages.append(message)
+    return messages
+
+
+def publish_session(job: tuple) -> str:
+    """Render one session (runs in a worker process); returns the output path."""
+    path, out_path, fmt, project_path, mtime = job
+    messages = read_messages(path)
+    dedupe_results(messages)
+    context = {
+        "messages": messages,
+        "session_id": Path(path).stem,
+        "project_path": project_path,
+        "date": datetime.fromtimestamp(mtime),
+    }
+    if fmt == "html":
+        context["css"] = (APP_DIR / "static" / "style.css").read_text()
+        render_markdown(messages)
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(f"{out_path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for chunk in env.get_template(f"publish{FORMATS[fmt]}").generate(context):
+            f.write(chunk)
+    tmp.replace(out_path)
+    os.utime(out_path, (mtime, mtime))
+    return str(out_path)
+
+
+def publish(projects_dir: Path, out_dir: Path, decode_path, fmt: str = "html", project: str | None = None,
+            force: bool = False, workers: int | None = None) -> tuple[int, int]:
+    """Render changed sessions under out_dir; returns (written, up to date) counts.
+
+    decode_path maps an encoded project directory name to a display path.
+    """
+    sessions = [s for s in scan_projects(projects_dir) if not project or project in s.project]
+    jobs = []
+    up_to_date = 0
+    for session in sessions:
+        out_path = out_dir / session.project / f"{session.id}{FORMATS[fmt]}"
+        try:
+            if not force and out_path.stat().st_mtime >= session.mtime:
+                up_to_date += 1
+                continue
+        except OSError:
+            pass
+        jobs.append((session.path, str(out_path), fmt, decode_path(session.project), session.mtime))
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(min(workers, len(jobs))) as pool:
+            for _ in pool.map(publish_session, jobs, chunksize=CHUNK_SIZE):
+                pass
+    else:
+        for job in jobs:
+            publish_session(job)
+
+    write_index(out_dir, fmt, decode_path)
+    return len(jobs), up_to_date
+
+
+def write_index(out_dir: Path, fmt: str, decode_path):
+    """List every exported session, most recently modified first per project."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    projects = []
+    for project_dir in sorted(p for p in out_dir.iterdir() if p.is_dir()):
+        files = sorted(project_dir.glob(f"*{FORMATS[fmt]}"), key=lambda p: p.stat().st_mtime, reverse=True)
+        if files:
+            projects.append((decode_path(project_dir.name), [f.relative_to(out_dir).as_posix() for f in files]))
+    template = env.get_template(f"publish_index{FORMATS[fmt]}")
+    (out_dir / f"index{FORMATS[fmt]}").write_text(template.render(projects=projects), encoding="utf-8")
@@ -0,0 +1,68 @@
+"""Directory scanning for ~/.claude/projects.
+
+Each session file is stat()ed exactly once: os.scandir() reports file types
+from the directory listing itself, so the only syscall per file is the stat
+for mtime and size. Projects can be scanned in a thread pool, which helps
+when the home directory is on a network mount and stat latency dominates.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+# Threads for scan_projects(); stat() releases the GIL
+SCAN_WORKERS = 8
+
+
+class SessionFile(NamedTuple):
+    project: str  # encoded project directory name
+    id: str
+    path: str
+    mtime: float
+    size: int
+
+
+def scan_project(project_dir: str) -> list[SessionFile]:
+    """Stat the session files of one project directory."""
+    project = os.path.basename(project_dir)
+    sessions = []
+    try:
+        entries = os.scandir(project_dir)
+    except OSError:
+        return sessions
+    with entries:
+        for entry in entries:
+            if not entry.name.endswith(".jsonl") or not entry.is_file():
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                # Removed between listing and stat
+                continue
+            session_id = entry.name.removesuffix(".jsonl")
+            sessions.append(SessionFile(project, session_id, entry.path, st.st_mtime, st.st_size))
+    return sessions
+
+
+def project_names(projects_dir: Path) -> list[str]:
+    """Encoded names of the project directories under projects_dir, without stat()ing sessions."""
+    try:
+        with os.scandir(projects_dir) as entries:
+            return [entry.name for entry in entries if entry.is_dir()]
+    except OSError:
+        return []
+
+
+def scan_projects(projects_dir: Path, workers: int = SCAN_WORKERS) -> list[SessionFile]:
+    """Stat every session file under projects_dir, one thread per project at a time."""
+    project_dirs = [os.path.join(projects_dir, name) for name in project_names(projects_dir)]
+    if not project_dirs:
+        return []
+
+    if workers <= 1 or len(project_dirs) <= 1:
+        results = map(scan_project, project_dirs)
+    else:
+        with ThreadPoolExecutor(workers) as pool:
+            results = list(pool.map(scan_project, project_dirs))
+    return [session for sessions in results for session in sessions]
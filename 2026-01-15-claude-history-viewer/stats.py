@@ -0,0 +1,278 @@
+"""Cross-session analytics: token usage, tool usage and timing.
+
+Every session file is reduced to a small per-session summary (tool call
+counts and time, token usage per model, turn latencies, duration) in a
+process pool, since decoding whole sessions is CPU-bound. Summaries are
+stored in SQLite keyed by path, mtime and size, so a re-run only processes
+new or changed files; reports are merged from the stored summaries.
+
+Timing comes from `timestamp` deltas: a tool call lasts from its tool_use
+to the matching tool_result, a turn from a prompt to the last assistant
+line before the next prompt, a session from its first to its last line.
+"""
+
+import json
+import multiprocessing
+import os
+import sqlite3
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+from decode import DecodeError, iter_complete_lines, loads
+from index import BUSY_TIMEOUT, cache_dir
+from scan import scan_projects
+
+# Bump when analyze_session() output changes; stored summaries are recomputed
+STATS_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_stats (
+    path TEXT PRIMARY KEY,
+    project TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+"""
+
+# Token counters of message.usage
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+# Sessions per task sent to a worker process
+CHUNK_SIZE = 8
+
+# Summaries written per transaction, so an interrupted run keeps its progress
+COMMIT_EVERY = 200
+
+
+def parse_time(timestamp) -> datetime | None:
+    """A line's ISO "timestamp" field as a datetime; None when missing or malformed."""
+    if not isinstance(timestamp, str):
+        return None
+    try:
+        return datetime.fromisoformat(timestamp)
+    except ValueError:
+        return None
+
+
+def analyze_session(path: str) -> dict:
+    """Summarize one session file (runs in a worker process)."""
+    tools = defaultdict(lambda: [0, 0.0])  # name -> [calls, seconds]
+    usage = defaultdict(lambda: dict.fromkeys(USAGE_FIELDS, 0))  # model -> token counts
+    pending_tools = {}  # tool_use id -> (name, time)
+    seen_messages = set()
+    turns = []
+    turn_start = turn_end = None
+    start = end = None
+
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return {}
+    with f:
+        for line in iter_complete_lines(f):
+            try:
+                msg = loads(line)
+            except DecodeError:
+                continue
+            if not isinstance(msg, dict):
+                continue
+
+            parsed = parse_time(msg.get("timestamp"))
+            time = parsed.timestamp() if parsed else None
+            if time is not None:
+                start = time if start is None else min(start, time)
+                end = time if end is None else max(end, time)
+            message = msg.get("message") or {}
+            content = message.get("content")
+
+            if msg.get("type") == "assistant":
+                # A reply with several content blocks is split over lines that
+                # repeat its id and usage; count the usage once
+                message_id = message.get("id")
+                if message.get("usage") and (message_id is None or message_id not in seen_messages):
+                    seen_messages.add(message_id)
+                    counts = usage[message.get("model") or "unknown"]
+                    for field in USAGE_FIELDS:
+                        counts[field] += message["usage"].get(field) or 0
+                for block in content if isinstance(content, list) else []:
+                    if block.get("type") == "tool_use":
+                        name = block.get("name") or "unknown"
+                        tools[name][0] += 1
+                        pending_tools[block.get("id")] = (name, time)
+                if time is not None:
+                    turn_end = time
+
+            elif msg.get("type") == "user":
+                blocks = content if isinstance(content, list) else []
+                results = [block for block in blocks if block.get("type") == "tool_result"]
+                for block in results:
+                    name, called = pending_tools.pop(block.get("tool_use_id"), (None, None))
+                    if name and called is not None and time is not None:
+                        tools[name][1] += max(0.0, time - called)
+                if not results and time is not None:
+                    # A new prompt ends the previous turn
+                    if turn_start is not None and turn_end is not None and turn_end >= turn_start:
+                        turns.append(turn_end - turn_start)
+                    turn_start, turn_end = time, None
+
+    if turn_start is not None and turn_end is not None and turn_end >= turn_start:
+        turns.append(turn_end - turn_start)
+    return {
+        "tools": dict(tools),
+        "usage": dict(usage),
+        "turns": turns,
+        "start": start,
+        "end": end,
+    }
+
+
+def _mp_context():
+    # Forking a process that has threads (the web server) can deadlock
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+
+
+def percentiles(values: list[float]) -> dict:
+    """count, total, median, p90 and max of values."""
+    values = sorted(values)
+    if not values:
+        return {"count": 0, "total": 0.0, "median": None, "p90": None, "max": None}
+    return {
+        "count": len(values),
+        "total": sum(values),
+        "median": values[(len(values) - 1) // 2],
+        "p90": values[min(len(values) - 1, int(len(values) * 0.9))],
+        "max": values[-1],
+    }
+
+
+def format_duration(seconds: float | None) -> str:
+    """Compact duration: 4.2s, 3m05s, 2h07m."""
+    if seconds is None:
+        return "-"
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, seconds = divmod(int(seconds), 60)
+    if minutes < 60:
+        return f"{minutes}m{seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m"
+
+
+class SessionStats:
+    """Per-session summaries cached in SQLite, keyed by session file path."""
+
+    def __init__(self, projects_dir: Path, db_path: Path | None = None, workers: int | None = None):
+        self.projects_dir = projects_dir
+        self.db_path = db_path or cache_dir(projects_dir) / "stats.db"
+        self.workers = workers or os.cpu_count() or 1
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT)
+        conn.execute("PRAGMA journal_mode=WAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] != STATS_VERSION:
+            conn.execute("DROP TABLE IF EXISTS session_stats")
+            conn.execute(f"PRAGMA user_version = {STATS_VERSION}")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def update(self) -> int:
+        """Summarize new and changed sessions; returns how many were processed."""
+        on_disk = {session.path: session for session in scan_projects(self.projects_dir)}
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT path, mtime, size FROM session_stats")
+            stored = {path: (mtime, size) for path, mtime, size in rows}
+            with conn:
+                conn.executemany(
+                    "DELETE FROM session_stats WHERE path = ?", [(path,) for path in stored.keys() - on_disk.keys()]
+                )
+            changed = [s for s in on_disk.values() if stored.get(s.path) != (s.mtime, s.size)]
+            if not changed:
+                return 0
+
+            paths = [session.path for session in changed]
+            if self.workers > 1 and len(changed) > 1:
+                pool = ProcessPoolExecutor(min(self.workers, len(changed)), mp_context=_mp_context())
+                results = pool.map(analyze_session, paths, chunksize=CHUNK_SIZE)
+            else:
+                pool = None
+                results = map(analyze_session, paths)
+
+            try:
+                rows = []
+                for session, data in zip(changed, results):
+                    rows.append((session.path, session.project, session.mtime, session.size, json.dumps(data)))
+                    if len(rows) >= COMMIT_EVERY:
+                        self._store(conn, rows)
+                        rows = []
+                self._store(conn, rows)
+            finally:
+                if pool:
+                    pool.shutdown(cancel_futures=True)
+        return len(changed)
+
+    def _store(self, conn: sqlite3.Connection, rows: list[tuple]):
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO session_stats VALUES (?, ?, ?, ?, ?)", rows)
+
+    def summary(self, project: str | None = None) -> dict:
+        """Aggregates over all sessions, or one project's."""
+        tools = defaultdict(lambda: [0, 0.0])
+        models = defaultdict(lambda: dict.fromkeys(USAGE_FIELDS, 0))
+        projects = defaultdict(lambda: {"sessions": 0, "duration": 0.0, **dict.fromkeys(USAGE_FIELDS, 0)})
+        turns = []
+        durations = []
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT project, data FROM session_stats WHERE :project IS NULL OR project = :project",
+                {"project": project},
+            ).fetchall()
+
+        for session_project, data in rows:
+            data = json.loads(data)
+            if not data:
+                continue
+            totals = projects[session_project]
+            totals["sessions"] += 1
+            for name, (calls, seconds) in data["tools"].items():
+                tools[name][0] += calls
+                tools[name][1] += seconds
+            for model, counts in data["usage"].items():
+                for field in USAGE_FIELDS:
+                    models[model][field] += counts[field]
+                    totals[field] += counts[field]
+            turns.extend(data["turns"])
+            if data["start"] is not None:
+                duration = data["end"] - data["start"]
+                durations.append(duration)
+                totals["duration"] += duration
+
+        def with_total(counts: dict) -> dict:
+            return {**counts, "total_tokens": sum(counts[field] for field in USAGE_FIELDS)}
+
+        return {
+            "sessions": len(rows),
+            "projects": sorted(
+                ({"project": name, **with_total(totals)} for name, totals in projects.items()),
+                key=lambda p: p["total_tokens"],
+                reverse=True,
+            ),
+            "models": sorted(
+                ({"model": name, **with_total(counts)} for name, counts in models.items()),
+                key=lambda m: m["total_tokens"],
+                reverse=True,
+            ),
+            "tools": sorted(
+                ({"name": name, "calls": calls, "seconds": seconds} for name, (calls, seconds) in tools.items()),
+                key=lambda t: (t["seconds"], t["calls"]),
+                reverse=True,
+            ),
+            "turns": percentiles(turns),
+            "durations": percentiles(durations),
+        }
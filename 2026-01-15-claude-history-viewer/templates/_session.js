@@ -0,0 +1,44 @@
+// Markdown rendering and thinking/tool toggles; included by session.html and publish.html
+
+// Render markdown in all .markdown elements under root (published pages come pre-rendered, without marked)
+function renderMarkdown(root) {
+  if (typeof marked === "undefined") return;
+  root.querySelectorAll(".markdown").forEach((el) => {
+    el.innerHTML = marked.parse(el.textContent);
+  });
+}
+
+// Hide assistant cards that have no visible content
+function updateAssistantVisibility() {
+  const showThinking = document.getElementById("show-thinking").checked;
+  const showTools = document.getElementById("show-tools").checked;
+
+  document.querySelectorAll(".message.assistant").forEach((card) => {
+    const hasText = card.querySelector(".message-content") !== null;
+    const hasThinking = card.querySelector(".thinking") !== null;
+    const hasTools = card.querySelector(".tool-use") !== null;
+
+    // Show if: has text, OR (has thinking AND showing thinking), OR (has tools AND showing tools)
+    const visible = hasText || (hasThinking && showThinking) || (hasTools && showTools);
+    card.style.display = visible ? "block" : "none";
+  });
+}
+
+// Apply the thinking/tool toggles to blocks under root
+function applyToggles(root) {
+  const showThinking = document.getElementById("show-thinking").checked;
+  const showTools = document.getElementById("show-tools").checked;
+  root.querySelectorAll(".thinking").forEach((el) => {
+    el.style.display = showThinking ? "block" : "none";
+  });
+  root.querySelectorAll(".tool-use, .tool-result").forEach((el) => {
+    el.style.display = showTools ? "block" : "none";
+  });
+  updateAssistantVisibility();
+}
+
+document.getElementById("show-thinking").addEventListener("change", () => applyToggles(document));
+document.getElementById("show-tools").addEventListener("change", () => applyToggles(document));
+
+renderMarkdown(document);
+updateAssistantVisibility();
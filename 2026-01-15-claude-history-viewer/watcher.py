@@ -0,0 +1,132 @@
+"""Background watcher that keeps the viewer's caches in sync with ~/.claude.
+
+Uses watchdog (inotify/FSEvents) when it is installed and falls back to
+polling otherwise. Either way only appended bytes are parsed: session files
+go through SessionIndex.update(), which resumes from the last indexed byte,
+and history.jsonl is followed with a FileTail.
+"""
+
+import threading
+import time
+from pathlib import Path
+
+from decode import DecodeError, iter_complete_lines, loads
+from index import SessionIndex
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+# Fields of history.jsonl entries kept in memory, those prompt search shows
+HISTORY_FIELDS = ("display", "timestamp", "sessionId", "project")
+
+
+class FileTail:
+    """Follow a JSONL file, returning the entries appended since the last read."""
+
+    def __init__(self, path: Path, offset: int = 0, decode=loads):
+        self.path = path
+        self.offset = offset
+        self.decode = decode
+        self.inode = None
+        # Whether the last read_new() started over, invalidating entries read before
+        self.restarted = False
+
+    def read_new(self) -> list[dict]:
+        """Parse complete lines written after the current offset."""
+        self.restarted = False
+        try:
+            st = self.path.stat()
+        except OSError:
+            return []
+        size = st.st_size
+        if size < self.offset or self.inode not in (None, st.st_ino):
+            # Truncated or replaced: start over
+            self.offset = 0
+            self.restarted = True
+        self.inode = st.st_ino
+        if size == self.offset:
+            return []
+
+        entries = []
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            for line in iter_complete_lines(f):
+                self.offset += len(line)
+                try:
+                    entries.append(self.decode(line))
+                except DecodeError:
+                    continue
+        return entries
+
+
+class Watcher:
+    """Push file changes into the session index and an in-memory history list."""
+
+    def __init__(self, session_index: SessionIndex, history_file: Path, interval: float = 2.0):
+        self.session_index = session_index
+        self.history_file = history_file
+        self.interval = interval
+        self.history_tail = FileTail(history_file)
+        self.history_entries: list[dict] = []
+        self._history_lock = threading.Lock()
+
+    def start(self):
+        """Sync once, then follow changes in a daemon thread."""
+        self.session_index.refresh()
+        self.update_history()
+        if Observer:
+            observer = Observer()
+            handler = _EventHandler(self)
+            observer.schedule(handler, str(self.session_index.projects_dir), recursive=True)
+            observer.schedule(handler, str(self.history_file.parent), recursive=False)
+            observer.daemon = True
+            observer.start()
+        else:
+            threading.Thread(target=self._poll, name="history-watcher", daemon=True).start()
+
+    def update_history(self):
+        """Append new history.jsonl entries to history_entries (all of them again after a rewrite)."""
+        with self._history_lock:
+            entries = self.history_tail.read_new()
+            if self.history_tail.restarted:
+                self.history_entries.clear()
+            self.history_entries.extend(
+                {key: entry[key] for key in HISTORY_FIELDS if key in entry}
+                for entry in entries if isinstance(entry, dict)
+            )
+
+    def on_change(self, path: Path):
+        """Handle a created, modified or deleted file."""
+        if path == self.history_file:
+            self.update_history()
+        elif path.suffix == ".jsonl" and path.parent.parent == self.session_index.projects_dir:
+            self.session_index.update(path)
+
+    def _poll(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.session_index.refresh()
+                self.update_history()
+            except Exception as e:
+                print(f"watcher: {e}")
+
+
+if Observer:
+
+    class _EventHandler(FileSystemEventHandler):
+        def __init__(self, watcher: Watcher):
+            self.watcher = watcher
+
+        def on_any_event(self, event):
+            if event.is_directory or event.event_type in ("opened", "closed_no_write"):
+                return
+            for path in (event.src_path, getattr(event, "dest_path", "")):
+                if path:
+                    try:
+                        self.watcher.on_change(Path(path))
+                    except Exception as e:
+                        print(f"watcher: {e}")
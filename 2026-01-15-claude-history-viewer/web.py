@@ -1,254 +1,776 @@
 #!/usr/bin/env python3
 """Web UI for browsing Claude Code conversation history."""
 
+import argparse
+import base64
+import gzip
+import hashlib
 import json
+import os
+import time
+import zlib
+from itertools import islice
 from pathlib import Path
-from datetime import datetime
-from flask import Flask, render_template, request
+from datetime import datetime, timezone
+from flask import Flask, render_template, request, stream_template, stream_with_context, url_for
+from markupsafe import Markup, escape
+
+from cache import LRUCache
+from decode import DecodeError, decode_entry, iter_complete_lines
+from history import search_history_file
+from index import CACHE_DIR, MATCH_END, MATCH_START, SessionIndex
+from lookup import AmbiguousSessionId, SessionLookup
+from messages import parse_message
+from paths import decode_project_path
+from stats import SessionStats, format_duration
+from watcher import FileTail, Watcher
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 app = Flask(__name__)
 
-CLAUDE_DIR = Path.home() / ".claude"
+CLAUDE_DIR = Path(os.environ.get("CLAUDE_DIR") or Path.home() / ".claude")
 PROJECTS_DIR = CLAUDE_DIR / "projects"
 
+# Seconds between index rescans; within that window pages are served from the index
+REFRESH_INTERVAL = 5.0
 
-def decode_project_path(encoded: str) -> str:
-    """Decode an encoded project path back to the original filesystem path.
+# JSONL lines per session page
+PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
 
-    Claude encodes paths like /home/user/my-project as -home-user-my-project.
-    We can't naively replace all hyphens with slashes because hyphens may be
-    part of actual directory names. Instead, we try all possible interpretations
-    and pick the one that matches the most path components on the filesystem.
-    """
-    if not encoded.startswith("-"):
-        return "/" + encoded.replace("-", "/")
+# Sessions per /api/v1 sessions page, and search results per API request
+API_SESSIONS_PAGE_SIZE = 50
+API_SEARCH_LIMIT = 50
 
-    # Remove leading hyphen
-    encoded = encoded[1:]
-    parts = encoded.split("-")
+# Seconds between size checks of a followed session, and between keepalives
+LIVE_POLL_INTERVAL = 1.0
+LIVE_KEEPALIVE = 15.0
 
-    def find_best_path(idx: int, current_path: Path) -> tuple[int, int, list[str]]:
-        """Recursively find the best path interpretation.
+# Only sessions written to this recently are followed, and a stream ends after
+# this long without new messages (the browser reconnects), so idle tabs don't
+# hold server threads
+LIVE_RECENT = 3600.0
+LIVE_IDLE_TIMEOUT = 60.0
 
-        Returns (validated_count, total_count, path_parts) where:
-        - validated_count: number of components that exist as directories
-        - total_count: total number of path components
-        Lower total_count is better when validated_count is equal (prefer fewer unvalidated parts).
-        """
-        if idx >= len(parts):
-            return (0, 0, [])
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_MIMETYPES = {"text/html", "application/json"}
 
-        best = None  # (validated, total, parts)
+# Serve mode: gunicorn worker processes, and threads per worker (each live
+# tail holds a thread for as long as the page is open)
+SERVE_WORKERS = min(os.cpu_count() or 1, 4)
+SERVE_THREADS = 16
 
-        # Try joining parts[idx:end+1] as a single path component
-        component = ""
-        for end in range(idx, len(parts)):
-            if component:
-                component = component + "-" + parts[end]
-            else:
-                component = parts[end]
+# Part of every ETag, so a restart with new code or templates invalidates them
+SERVER_START = time.time()
 
-            test_path = current_path / component
-            is_valid = test_path.is_dir()
+# In-memory budget for parsed and rendered session pages; --disk-cache adds a disk tier
+RENDER_CACHE_BYTES = 256 * 1024 * 1024
+RENDER_CACHE_DISK_BYTES = 2 * 1024 * 1024 * 1024
 
-            # Recurse to find remaining path
-            sub_validated, sub_total, sub_parts = find_best_path(end + 1, test_path if is_valid else current_path)
+session_index = SessionIndex(PROJECTS_DIR)
+session_lookup = SessionLookup(PROJECTS_DIR)
+render_cache = LRUCache(RENDER_CACHE_BYTES)
+session_stats = SessionStats(PROJECTS_DIR)
 
-            validated = (1 if is_valid else 0) + sub_validated
-            total = 1 + sub_total
-            result = (validated, total, [component] + sub_parts)
+app.add_template_filter(format_duration, "duration")
 
-            # Prefer: more validated, then fewer total parts
-            if best is None or (validated, -total) > (best[0], -best[1]):
-                best = result
+# Set by --watch; when running, the index is kept fresh without rescans
+watcher: Watcher | None = None
 
-        return best if best else (0, 0, [])
 
-    _, _, path_parts = find_best_path(0, Path("/"))
-    return "/" + "/".join(path_parts)
+def refresh_index():
+    """Rescan session files unless the watcher is keeping the index fresh."""
+    if watcher is None:
+        session_index.refresh(min_interval=REFRESH_INTERVAL)
 
 
 def get_projects():
     """Get all projects with session counts."""
+    refresh_index()
     projects = []
-    for project_dir in sorted(PROJECTS_DIR.iterdir()):
-        if project_dir.is_dir():
-            sessions = list(project_dir.glob("*.jsonl"))
-            if sessions:
-                # Get most recent session time
-                latest = max(s.stat().st_mtime for s in sessions)
-                projects.append({
-                    "encoded": project_dir.name,
-                    "path": decode_project_path(project_dir.name),
-                    "session_count": len(sessions),
-                    "latest": datetime.fromtimestamp(latest),
-                })
-    # Sort by most recent activity
-    return sorted(projects, key=lambda p: p["latest"], reverse=True)
+    for row in session_index.projects():
+        projects.append({
+            "encoded": row["project"],
+            "path": decode_project_path(row["project"], session_index),
+            "session_count": row["session_count"],
+            "latest": datetime.fromtimestamp(row["latest"]),
+        })
+    return projects
 
 
 def get_sessions(encoded_project: str):
     """Get sessions for a project."""
-    project_dir = PROJECTS_DIR / encoded_project
-    if not project_dir.exists():
-        return []
-
+    refresh_index()
     sessions = []
-    for session_file in sorted(project_dir.glob("*.jsonl"), key=lambda p: p.stat().st_mtime, reverse=True):
-        mtime = datetime.fromtimestamp(session_file.stat().st_mtime)
-        size_kb = session_file.stat().st_size // 1024
-
-        # Get first user message as preview
-        preview = ""
-        try:
-            with open(session_file) as f:
-                for line in f:
-                    msg = json.loads(line)
-                    if msg.get("type") == "user":
-                        content = msg.get("message", {}).get("content", "")
-                        if isinstance(content, str):
-                            preview = content[:100].replace("\n", " ")
-                            break
-        except:
-            pass
-
+    for row in session_index.sessions(encoded_project):
         sessions.append({
-            "id": session_file.stem,
-            "date": mtime,
-            "size_kb": size_kb,
-            "preview": preview,
+            "id": row["id"],
+            "date": datetime.fromtimestamp(row["mtime"]),
+            "size_kb": row["size"] // 1024,
+            "preview": row["preview"][:100].replace("\n", " "),
         })
     return sessions
 
 
-def get_session_messages(session_id: str):
-    """Get all messages from a session."""
-    # Find the session file
-    session_file = None
-    project_encoded = None
-    for project_dir in PROJECTS_DIR.iterdir():
-        candidate = project_dir / f"{session_id}.jsonl"
-        if candidate.exists():
-            session_file = candidate
-            project_encoded = project_dir.name
-            break
-        # Try partial match
-        for f in project_dir.glob(f"{session_id}*.jsonl"):
-            session_file = f
-            project_encoded = project_dir.name
-            break
-        if session_file:
-            break
+def find_session_file(session_id: str):
+    """Resolve a (possibly partial) session id to (file, encoded project).
 
-    if not session_file:
-        return None, None
+    Raises AmbiguousSessionId if a partial id matches several sessions.
+    """
+    return session_lookup.resolve(session_id) or (None, None)
+
+
+class SessionStream:
+    """Parse a session lazily, yielding display messages one at a time.
+
+    offset is the number of bytes consumed so far, i.e. where a live tail
+    should continue once iteration has finished.
+    """
+
+    def __init__(self, session_file: Path):
+        self.session_file = session_file
+        self.offset = 0
+
+    def __iter__(self):
+        with open(self.session_file, "rb") as f:
+            for line in iter_complete_lines(f):
+                self.offset += len(line)
+                try:
+                    msg = decode_entry(line)
+                except DecodeError:
+                    continue
+                message = parse_message(msg)
+                if message:
+                    yield message
+
+
+def buffered(chunks, size: int = 16 * 1024):
+    """Join small template chunks into larger writes."""
+    buffer = []
+    buffered_size = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered_size += len(chunk)
+        if buffered_size >= size:
+            yield "".join(buffer)
+            buffer = []
+            buffered_size = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def get_session_messages(session_id: str, start: int = 0, limit: int | None = None):
+    """Get messages from a session, optionally a page of them.
+
+    Returns (messages, project_encoded, next_start, end_offset) where
+    next_start is the line number to continue from, or None on the last
+    page, and end_offset is the byte offset just after the last page (None
+    otherwise).
+    """
+    session_file, project_encoded = find_session_file(session_id)
+    row = session_index.update(session_file) if session_file else None
+    if not row:
+        return None, None, None, None
+    messages, next_start, end_offset = read_session_page(row, start, limit)
+    return messages, project_encoded, next_start, end_offset
+
+
+def read_session_page(row, start: int, limit: int | None):
+    """Parse a page of an indexed session: (messages, next_start, end_offset).
+
+    Uses the line offset index to seek straight to the requested lines, so
+    the cost depends on the page size rather than the session size. Results
+    are cached by file mtime and size.
+    """
+    key = ("messages", row["path"], row["mtime"], row["size"], start, limit)
+    cached = render_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Fetch one extra line to know whether there is a next page
+    lines = session_index.message_lines(row["path"], start, None if limit is None else limit + 1)
+    next_start = None
+    end_offset = None
+    if limit is not None and len(lines) > limit:
+        next_start = lines[limit]["line_no"]
+        lines = lines[:limit]
+    elif lines:
+        end_offset = lines[-1]["offset"] + lines[-1]["length"]
+    else:
+        end_offset = 0
 
     messages = []
-    with open(session_file) as f:
-        for line in f:
-            msg = json.loads(line)
-            msg_type = msg.get("type")
-
-            if msg_type == "user":
-                content = msg.get("message", {}).get("content", "")
-                if isinstance(content, str):
-                    messages.append({
-                        "role": "user",
-                        "content": content,
-                        "timestamp": msg.get("timestamp"),
-                    })
-                else:
-                    # Tool results - collect them
-                    tool_results = []
-                    for item in content:
-                        if item.get("type") == "tool_result":
-                            tool_results.append(item.get("content", ""))
-                    if tool_results:
-                        messages.append({
-                            "role": "tool_result",
-                            "results": tool_results,
-                            "timestamp": msg.get("timestamp"),
-                        })
-
-            elif msg_type == "assistant":
-                content = msg.get("message", {}).get("content", [])
-                blocks = []
-                for block in content:
-                    block_type = block.get("type")
-                    if block_type == "thinking":
-                        blocks.append({"type": "thinking", "content": block.get("thinking", "")})
-                    elif block_type == "text":
-                        blocks.append({"type": "text", "content": block.get("text", "")})
-                    elif block_type == "tool_use":
-                        blocks.append({
-                            "type": "tool_use",
-                            "name": block.get("name", ""),
-                            "input": json.dumps(block.get("input", {}), indent=2),
-                        })
-                if blocks:
-                    messages.append({
-                        "role": "assistant",
-                        "blocks": blocks,
-                        "timestamp": msg.get("timestamp"),
-                    })
-
-    return messages, project_encoded
+    with open(row["path"], "rb") as f:
+        for line in lines:
+            f.seek(line["offset"])
+            message = parse_message(decode_entry(f.read(line["length"])))
+            if message:
+                messages.append(message)
+
+    result = (messages, next_start, end_offset)
+    render_cache.put(key, result)
+    return result
+
+
+def render_session_page(session_id: str, start: int, limit: int):
+    """Like get_session_messages(), with the page rendered by _messages.html.
+
+    Returns (html, project_encoded, next_start, end_offset); the HTML is
+    cached alongside the parsed messages.
+    """
+    session_file, project_encoded = find_session_file(session_id)
+    row = session_index.update(session_file) if session_file else None
+    if not row:
+        return None, None, None, None
+
+    key = ("html", row["path"], row["mtime"], row["size"], start, limit)
+    cached = render_cache.get(key)
+    if cached is None:
+        messages, next_start, end_offset = read_session_page(row, start, limit)
+        cached = (render_template("_messages.html", messages=messages), next_start, end_offset)
+        render_cache.put(key, cached)
+    html, next_start, end_offset = cached
+    return Markup(html), project_encoded, next_start, end_offset
 
 
 def search_history(query: str, limit: int = 50):
-    """Search history.jsonl for matching prompts."""
-    history_file = CLAUDE_DIR / "history.jsonl"
-    if not history_file.exists():
-        return []
+    """Search history.jsonl for matching prompts, most recent first."""
+    if watcher is not None:
+        # Entries are already parsed and kept up to date by the watcher
+        query = query.lower()
+        matching = (e for e in reversed(watcher.history_entries) if query in e.get("display", "").lower())
+        entries = list(islice(matching, limit))
+    else:
+        entries = search_history_file(CLAUDE_DIR / "history.jsonl", query, limit)
 
     matches = []
-    with open(history_file) as f:
-        for line in f:
-            entry = json.loads(line)
-            display = entry.get("display", "")
-            if query.lower() in display.lower():
-                matches.append({
-                    "timestamp": datetime.fromtimestamp(entry.get("timestamp", 0) / 1000),
-                    "session_id": entry.get("sessionId", ""),
-                    "display": display[:150],
-                    "project": entry.get("project", ""),
-                })
-
-    # Return most recent first
-    return matches[-limit:][::-1]
+    for entry in entries:
+        matches.append({
+            "timestamp": datetime.fromtimestamp(entry.get("timestamp", 0) / 1000, tz=timezone.utc).astimezone(),
+            "session_id": entry.get("sessionId", ""),
+            "display": entry.get("display", "")[:150],
+            "project": entry.get("project", ""),
+        })
+    return matches
+
+
+def search_sessions(query: str, project: str | None = None, since: str | None = None,
+                    until: str | None = None, limit: int = 50):
+    """Full-text search over session messages, best match first."""
+    refresh_index()
+    results = []
+    for row in session_index.search(query, project=project, since=since, until=until, limit=limit):
+        snippet = str(escape(row["snippet"])).replace(MATCH_START, "<mark>").replace(MATCH_END, "</mark>")
+        results.append({
+            "timestamp": datetime.fromisoformat(row["timestamp"]).astimezone() if row["timestamp"] else None,
+            "session_id": row["session_id"],
+            "display": Markup(snippet),
+            "project": row["project"],
+            "role": row["role"],
+        })
+    return results
+
+
+def conditional_response(*key, last_modified: float):
+    """Response carrying an ETag derived from key and a Last-Modified date.
+
+    It is already a 304 if the client's cached copy is current; otherwise
+    the caller fills in the body. Call this before parsing anything.
+    """
+    etag = hashlib.sha1(repr((SERVER_START, request.full_path, key)).encode()).hexdigest()
+    response = app.response_class()
+    # Weak, because compression changes the bytes but not the content
+    response.set_etag(etag, weak=True)
+    response.last_modified = datetime.fromtimestamp(last_modified, tz=timezone.utc)
+    # Cache, but revalidate on every navigation
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@app.after_request
+def compress(response):
+    """gzip or brotli-compress HTML/JSON responses, including streamed ones."""
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESS_MIMETYPES
+    ):
+        return response
+    if not response.is_streamed and (response.content_length or 0) < COMPRESS_MIN_SIZE:
+        return response
+
+    accepted = request.accept_encodings
+    if brotli and accepted["br"]:
+        encoding = "br"
+    elif accepted["gzip"]:
+        encoding = "gzip"
+    else:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    response.headers["Content-Encoding"] = encoding
+    if response.is_streamed:
+        response.response = compress_chunks(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    elif encoding == "br":
+        response.set_data(brotli.compress(response.get_data(), quality=5))
+    else:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=6))
+    return response
+
+
+def compress_chunks(chunks, encoding: str):
+    """Compress a streamed body, flushing each chunk so the browser can render it."""
+    chunks = (chunk.encode() if isinstance(chunk, str) else chunk for chunk in chunks)
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=5)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
 
 
 @app.route("/")
 def index():
     """List all projects."""
+    refresh_index()
+    count, latest, total_size = session_index.fingerprint()
+    response = conditional_response(count, latest, total_size, last_modified=latest or 0)
+    if response.status_code == 304:
+        return response
     projects = get_projects()
-    return render_template("projects.html", projects=projects)
+    response.set_data(render_template("projects.html", projects=projects))
+    return response
 
 
 @app.route("/project/<path:encoded>")
 def project(encoded):
     """List sessions for a project."""
+    refresh_index()
+    count, latest, total_size = session_index.fingerprint(encoded)
+    response = conditional_response(count, latest, total_size, last_modified=latest or 0)
+    if response.status_code == 304:
+        return response
     sessions = get_sessions(encoded)
-    decoded_path = decode_project_path(encoded)
-    return render_template("sessions.html", sessions=sessions, project_path=decoded_path, project_encoded=encoded)
+    decoded_path = decode_project_path(encoded, session_index)
+    response.set_data(
+        render_template("sessions.html", sessions=sessions, project_path=decoded_path, project_encoded=encoded)
+    )
+    return response
+
+
+def is_recent(session_file: Path) -> bool:
+    """Whether a session was written to within LIVE_RECENT, and so may still grow."""
+    try:
+        return time.time() - session_file.stat().st_mtime < LIVE_RECENT
+    except OSError:
+        return False
 
 
 @app.route("/session/<session_id>")
 def session(session_id):
-    """View a session's conversation."""
-    messages, project_encoded = get_session_messages(session_id)
-    if messages is None:
+    """View a session's conversation (first page; the rest loads on scroll).
+
+    With ?all=1 the whole session is streamed instead, rendering messages as
+    they are parsed so memory stays flat and the browser paints immediately.
+    """
+    session_file, project_encoded = find_session_file(session_id)
+    if not session_file:
         return "Session not found", 404
-    return render_template("session.html", messages=messages, session_id=session_id, project_encoded=project_encoded)
+    try:
+        st = session_file.stat()
+    except OSError:
+        return "Session not found", 404
+    response = conditional_response(str(session_file), st.st_mtime, st.st_size, last_modified=st.st_mtime)
+    if response.status_code == 304:
+        return response
+
+    if request.args.get("all"):
+        chunks = stream_template(
+            "session.html",
+            messages=SessionStream(session_file),
+            session_id=session_id,
+            project_encoded=project_encoded,
+            next_start=None,
+            follow=is_recent(session_file),
+        )
+        response.response = buffered(chunks)
+        response.headers.pop("Content-Length", None)
+        return response
+
+    start = max(0, request.args.get("start", 0, type=int))
+    messages_html, project_encoded, next_start, end_offset = render_session_page(session_id, start, PAGE_SIZE)
+    if messages_html is None:
+        return "Session not found", 404
+    response.set_data(
+        render_template(
+            "session.html",
+            messages_html=messages_html,
+            session_id=session_id,
+            project_encoded=project_encoded,
+            next_start=next_start,
+            end_offset=end_offset,
+            follow=is_recent(session_file),
+        )
+    )
+    return response
+
+
+@app.route("/session/<session_id>/messages")
+def session_messages(session_id):
+    """Next page of a session as rendered HTML, for "load more"."""
+    start = max(0, request.args.get("start", 0, type=int))
+    limit = api_limit(PAGE_SIZE)
+    html, _, next_start, end_offset = render_session_page(session_id, start, limit)
+    if html is None:
+        return {"error": "Session not found"}, 404
+    return {
+        "html": html,
+        "next_start": next_start,
+        "end_offset": end_offset,
+    }
+
+
+@app.route("/session/<session_id>/events")
+def session_events(session_id):
+    """Server-Sent Events stream of messages appended to a session.
+
+    Starts at ?offset= (or Last-Event-ID when the browser reconnects) and
+    polls the file size, so each update costs only the newly written bytes.
+    Each event carries the rendered HTML and has the new offset as its id.
+
+    The stream ends after LIVE_IDLE_TIMEOUT without new messages; the browser
+    then reconnects, and gets 204 (which stops EventSource retrying) once the
+    session hasn't been written to for LIVE_RECENT.
+    """
+    session_file, _ = find_session_file(session_id)
+    if not session_file:
+        return "Session not found", 404
+    if not is_recent(session_file):
+        return "", 204
+    offset = request.headers.get("Last-Event-ID", type=int)
+    if offset is None:
+        offset = request.args.get("offset", 0, type=int)
+    tail = FileTail(session_file, offset, decode_entry)
+
+    def generate():
+        idle = 0.0
+        quiet = 0.0
+        while quiet < LIVE_IDLE_TIMEOUT:
+            messages = [m for m in map(parse_message, tail.read_new()) if m]
+            if messages:
+                data = json.dumps({"html": render_template("_messages.html", messages=messages)})
+                yield f"id: {tail.offset}\ndata: {data}\n\n"
+                idle = quiet = 0.0
+            elif idle >= LIVE_KEEPALIVE:
+                # Comment line; lets the server notice disconnected clients
+                yield ": keepalive\n\n"
+                idle = 0.0
+            time.sleep(LIVE_POLL_INTERVAL)
+            idle += LIVE_POLL_INTERVAL
+            quiet += LIVE_POLL_INTERVAL
+
+    return app.response_class(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@app.route("/stats")
+def stats():
+    """Token, tool and timing aggregates, for all projects or ?project=."""
+    project = request.args.get("project") or None
+    refresh_index()
+    count, latest, total_size = session_index.fingerprint(project)
+    response = conditional_response(count, latest, total_size, last_modified=latest or 0)
+    if response.status_code == 304:
+        return response
+    session_stats.update()
+    summary = session_stats.summary(project)
+    for row in summary["projects"]:
+        row["path"] = decode_project_path(row["project"], session_index)
+    project_path = decode_project_path(project, session_index) if project else None
+    response.set_data(render_template("stats.html", summary=summary, project=project, project_path=project_path))
+    return response
+
+
+@app.route("/debug/cache")
+def cache_stats():
+    """Render cache hit/miss counters."""
+    return render_cache.stats()
+
+
+@app.errorhandler(AmbiguousSessionId)
+def ambiguous_session(e):
+    """List the candidates when a partial session id is not unique."""
+    if request.path.startswith("/api/"):
+        return {"error": "Ambiguous session id", "matches": e.matches}, 409
+    links = "".join(
+        f'<li><a href="{url_for("session", session_id=match)}">{match}</a></li>' for match in e.matches
+    )
+    return f"<p>Ambiguous session id {escape(e.prefix)}</p><ul>{links}</ul>", 409
 
 
 @app.route("/search")
 def search():
     """Search history."""
     query = request.args.get("q", "")
-    results = search_history(query) if query else []
-    return render_template("search.html", results=results, query=query)
+    mode = request.args.get("mode", "history")
+    if not query:
+        results = []
+    elif mode == "full":
+        results = search_sessions(
+            query,
+            project=request.args.get("project") or None,
+            since=request.args.get("since") or None,
+            until=request.args.get("until") or None,
+        )
+    else:
+        results = search_history(query)
+    return render_template("search.html", results=results, query=query, mode=mode)
+
+
+# JSON API. Mirrors the HTML views but returns data in pages, so a client
+# can fetch only the rows it displays.
+
+
+def api_limit(default: int, maximum: int = MAX_PAGE_SIZE) -> int:
+    """?limit= clamped to 1..maximum."""
+    return max(1, min(request.args.get("limit", default, type=int), maximum))
+
+
+def json_body(response, data):
+    """Fill a conditional_response() with a JSON body."""
+    response.mimetype = "application/json"
+    response.set_data(json.dumps(data))
+    return response
+
+
+def encode_cursor(row) -> str:
+    """Opaque cursor pointing after a session row."""
+    return base64.urlsafe_b64encode(json.dumps([row["mtime"], row["id"]]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[float, str] | None:
+    """(mtime, id) from encode_cursor(), or None if it is malformed."""
+    try:
+        mtime, session_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return float(mtime), str(session_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def isoformat(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
+@app.route("/api/v1/projects")
+def api_projects():
+    """All projects, most recently active first."""
+    refresh_index()
+    count, latest, total_size = session_index.fingerprint()
+    response = conditional_response(count, latest, total_size, last_modified=latest or 0)
+    if response.status_code == 304:
+        return response
+    projects = [
+        {
+            "encoded": row["project"],
+            "path": decode_project_path(row["project"], session_index),
+            "session_count": row["session_count"],
+            "latest": isoformat(row["latest"]),
+        }
+        for row in session_index.projects()
+    ]
+    return json_body(response, {"projects": projects})
+
+
+@app.route("/api/v1/projects/<encoded>/sessions")
+def api_sessions(encoded):
+    """A page of a project's sessions, most recent first.
+
+    Pass the returned next_cursor as ?cursor= for the following page; it is
+    null on the last one.
+    """
+    before = None
+    if request.args.get("cursor"):
+        before = decode_cursor(request.args["cursor"])
+        if before is None:
+            return {"error": "Invalid cursor"}, 400
+    limit = api_limit(API_SESSIONS_PAGE_SIZE)
+
+    refresh_index()
+    count, latest, total_size = session_index.fingerprint(encoded)
+    if not count:
+        return {"error": "Project not found"}, 404
+    response = conditional_response(count, latest, total_size, last_modified=latest)
+    if response.status_code == 304:
+        return response
+
+    # Fetch one extra row to know whether there is a next page
+    rows = session_index.sessions(encoded, before=before, limit=limit + 1)
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    sessions = [
+        {
+            "id": row["id"],
+            "modified": isoformat(row["mtime"]),
+            "size": row["size"],
+            "preview": row["preview"],
+        }
+        for row in rows[:limit]
+    ]
+    return json_body(response, {"sessions": sessions, "next_cursor": next_cursor})
+
+
+@app.route("/api/v1/sessions/<session_id>/messages")
+def api_session_messages(session_id):
+    """A page of a session's messages.
+
+    ?start= is a JSONL line number (0 for the beginning) and ?limit= a number
+    of lines. next_start continues with the next page and is null on the
+    last one, where end_offset is the byte offset for /session/<id>/events.
+    """
+    session_file, _ = find_session_file(session_id)
+    try:
+        st = session_file.stat() if session_file else None
+    except OSError:
+        st = None
+    if not st:
+        return {"error": "Session not found"}, 404
+    response = conditional_response(str(session_file), st.st_mtime, st.st_size, last_modified=st.st_mtime)
+    if response.status_code == 304:
+        return response
+
+    start = max(0, request.args.get("start", 0, type=int))
+    limit = api_limit(PAGE_SIZE)
+    messages, project_encoded, next_start, end_offset = get_session_messages(session_id, start, limit)
+    if messages is None:
+        return {"error": "Session not found"}, 404
+    return json_body(
+        response,
+        {
+            "id": session_file.stem,
+            "project": project_encoded,
+            "messages": messages,
+            "next_start": next_start,
+            "end_offset": end_offset,
+        },
+    )
+
+
+@app.route("/api/v1/search")
+def api_search():
+    """Search prompts (mode=history) or all messages (mode=full, with filters).
+
+    Full-text snippets are HTML-escaped, with matches wrapped in <mark>.
+    """
+    query = request.args.get("q", "")
+    mode = request.args.get("mode", "history")
+    limit = api_limit(API_SEARCH_LIMIT)
+    if not query:
+        return {"error": "Missing q"}, 400
+    if mode == "full":
+        results = search_sessions(
+            query,
+            project=request.args.get("project") or None,
+            since=request.args.get("since") or None,
+            until=request.args.get("until") or None,
+            limit=limit,
+        )
+    elif mode == "history":
+        results = search_history(query, limit)
+    else:
+        return {"error": f"Unknown mode {mode}"}, 400
+    for result in results:
+        result["display"] = str(result["display"])
+        if result["timestamp"]:
+            # Aware local times in the HTML views; UTC like the rest of the API
+            result["timestamp"] = result["timestamp"].astimezone(timezone.utc).isoformat()
+    return {"mode": mode, "results": results}
+
+
+@app.route("/api/v1/stats")
+def api_stats():
+    """The /stats aggregates; ?project= limits them to one project."""
+    project = request.args.get("project") or None
+    refresh_index()
+    count, latest, total_size = session_index.fingerprint(project)
+    response = conditional_response(count, latest, total_size, last_modified=latest or 0)
+    if response.status_code == 304:
+        return response
+    session_stats.update()
+    return json_body(response, session_stats.summary(project))
+
+
+def start_watcher(interval: float = 2.0):
+    """Follow ~/.claude in a background thread instead of rescanning per request."""
+    global watcher
+    watcher = Watcher(session_index, CLAUDE_DIR / "history.jsonl", interval)
+    watcher.start()
+
+
+def serve(host: str, port: int, workers: int = SERVE_WORKERS, threads: int = SERVE_THREADS, watch: bool = False):
+    """Serve with gunicorn's preforking server, or Flask's threaded server without it.
+
+    Workers are forked from this process. They share the SQLite index (and
+    the --disk-cache directory) on disk; in-memory caches are per worker.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("gunicorn is not installed (uv sync --extra serve); using Flask's threaded server")
+        if watch:
+            start_watcher()
+        app.run(host=host, port=port, threaded=True)
+        return
+
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("threads", threads)
+            if watch:
+                # Threads don't survive fork(), so each worker runs its own watcher
+                self.cfg.set("post_fork", lambda server, worker: start_watcher())
+
+        def load(self):
+            return app
+
+    Server().run()
 
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
+    parser = argparse.ArgumentParser(
+        description="Web UI for Claude Code history",
+        epilog="Set CLAUDE_DIR to browse a history directory other than ~/.claude.",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind (0.0.0.0 for all interfaces)")
+    parser.add_argument("--port", type=int, default=5000, help="Port to bind")
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS, help="Worker processes (with gunicorn)")
+    parser.add_argument("--threads", type=int, default=SERVE_THREADS, help="Threads per worker (with gunicorn)")
+    parser.add_argument("--debug", action="store_true", help="Flask development server with debugger and reloader")
+    parser.add_argument("--watch", action="store_true", help="Keep caches fresh with a background file watcher")
+    parser.add_argument("--disk-cache", action="store_true", help="Keep evicted rendered sessions on disk")
+    args = parser.parse_args()
+
+    if args.disk_cache:
+        render_cache = LRUCache(RENDER_CACHE_BYTES, CACHE_DIR / "render", RENDER_CACHE_DISK_BYTES)
+
+    if args.debug:
+        # The reloader runs this twice; only its child process serves requests
+        if args.watch and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+            start_watcher()
+        app.run(debug=True, host=args.host, port=args.port)
+    else:
+        serve(args.host, args.port, args.workers, args.threads, args.watch)
@@ -0,0 +1,130 @@
+"""Fuzzy matching of search results against "Artist - Song" queries.
+
+Text is normalized (NFKC, so full/half-width CJK and ASCII forms agree;
+accents folded; case-folded; punctuation to spaces) and stripped of
+qualifiers such as "(Remastered 2011)", "[Official MV]" or "feat. X", then
+compared with a token set ratio, which ignores word order and extra words
+on either side. Artist and song are scored separately (0-100) and mapped to
+the usual buckets:
+
+- high = artist (in channel or title) AND song (in title) match
+- medium = one of them matches
+- low = neither
+- none = no result
+
+Scoring is batched: with rapidfuzz (and numpy) installed, each column of
+pairs is compared in one `cpdist` call on all cores; otherwise a pure
+Python token set ratio on difflib is used.
+"""
+
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+try:
+    import numpy  # noqa: F401 (cpdist returns numpy arrays)
+    from rapidfuzz import fuzz
+    from rapidfuzz.process import cpdist
+except ImportError:
+    cpdist = None
+
+# Minimum token set ratio for the artist or song to count as matching
+MATCH_THRESHOLD = 80
+
+# Bracketed parts and trailing " - ..." parts that don't name the track
+QUALIFIER = re.compile(
+    r"(\d{4} )?(digital(ly)? )?remaster(ed)?( \d{4})?( version)?|"
+    r"official( music)?( video| audio| mv| m/?v)?|m/?v|music video|lyrics?( video)?|"
+    r"(hd|hq|4k)( video| audio)?|audio|visuali[sz]er|(feat|ft|featuring|with)\b.*",
+    re.IGNORECASE,
+)
+BRACKETED = re.compile(r"[(\[【〔]([^)\]】〕]*)[)\]】〕]")
+TRAILING = re.compile(r"\s+(-\s+)?((feat|ft)\.?|featuring)\s.*$|\s+-\s+[^-]*remaster[^-]*$", re.IGNORECASE)
+
+# Channel name parts that are not the artist's name
+CHANNEL_NOISE = re.compile(r"\s*-\s*topic$|vevo$|\bofficial\b", re.IGNORECASE)
+
+
+def _strip_qualifiers(text: str) -> str:
+    text = BRACKETED.sub(lambda m: " " if QUALIFIER.fullmatch(m.group(1).strip()) else m.group(0), text)
+    return TRAILING.sub("", text)
+
+
+@lru_cache(maxsize=65536)
+def normalize(text: str | None) -> str:
+    """Comparable form of text: qualifiers stripped, NFKC, accents folded, case-folded, words only."""
+    text = unicodedata.normalize("NFKC", text or "")
+    text = _strip_qualifiers(text)
+    # Fold Latin accents only: other combining marks (e.g. kana voicing) change the letter
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not "\u0300" <= c <= "\u036f")
+    text = unicodedata.normalize("NFC", text).casefold()
+    return re.sub(r"[\W_]+", " ", text).strip()
+
+
+@lru_cache(maxsize=65536)
+def split_query(query: str) -> tuple[str, str]:
+    """Normalized (artist, song) of an "Artist - Song" query; song is empty without a separator."""
+    artist, _, song = unicodedata.normalize("NFKC", query).partition(" - ")
+    return normalize(artist), normalize(song)
+
+
+def normalize_channel(channel: str | None) -> str:
+    return normalize(CHANNEL_NOISE.sub("", unicodedata.normalize("NFKC", channel or "")))
+
+
+def _ratio(a: str, b: str) -> float:
+    return SequenceMatcher(None, a, b, autojunk=False).ratio() * 100
+
+
+def token_set_ratio(a: str, b: str) -> float:
+    """Similarity (0-100) of two normalized strings' word sets; 100 when one contains the other's words."""
+    tokens_a, tokens_b = set(a.split()), set(b.split())
+    if not tokens_a or not tokens_b:
+        return 0.0
+    common = tokens_a & tokens_b
+    if common and (common == tokens_a or common == tokens_b):
+        return 100.0
+    sect = " ".join(sorted(common))
+    rest_a = " ".join(filter(None, [sect, " ".join(sorted(tokens_a - common))]))
+    rest_b = " ".join(filter(None, [sect, " ".join(sorted(tokens_b - common))]))
+    if not sect:
+        return _ratio(rest_a, rest_b)
+    return max(_ratio(sect, rest_a), _ratio(sect, rest_b), _ratio(rest_a, rest_b))
+
+
+def pairwise_ratio(a: list[str], b: list[str]) -> list[float]:
+    """token_set_ratio of each a[i] with b[i]."""
+    if cpdist is not None:
+        return cpdist(a, b, scorer=fuzz.token_set_ratio, workers=-1).tolist()
+    return [token_set_ratio(x, y) for x, y in zip(a, b)]
+
+
+def match_scores(queries: list[str], titles: list[str | None], channels: list[str | None]) -> list[tuple[float, str]]:
+    """(score 0-100, confidence bucket) of each result (titles[i], channels[i]) for queries[i]."""
+    artists, songs = zip(*map(split_query, queries)) if queries else ((), ())
+    norm_titles = [normalize(t) for t in titles]
+    norm_channels = [normalize_channel(c) for c in channels]
+    artist_title = pairwise_ratio(list(artists), norm_titles)
+    artist_channel = pairwise_ratio(list(artists), norm_channels)
+    song_title = pairwise_ratio(list(songs), norm_titles)
+
+    scores = []
+    for i, (title, channel) in enumerate(zip(titles, channels)):
+        if not title and not channel:
+            scores.append((0.0, "none"))
+            continue
+        artist = max(artist_title[i], artist_channel[i])
+        matches = artist >= MATCH_THRESHOLD
+        if songs[i]:
+            score = (artist + song_title[i]) / 2
+            matches += song_title[i] >= MATCH_THRESHOLD
+        else:
+            score = artist
+        scores.append((round(score, 1), ["low", "medium", "high"][matches]))
+    return scores
+
+
+def match_score(query: str, title: str | None, channel: str | None) -> tuple[float, str]:
+    """(score 0-100, confidence bucket) of a single result."""
+    return match_scores([query], [title], [channel])[0]
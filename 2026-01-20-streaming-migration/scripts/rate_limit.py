@@ -0,0 +1,93 @@
+"""Adaptive concurrency and retry backoff for YouTube searches."""
+
+import asyncio
+import random
+import re
+import time
+
+# yt-dlp errors worth retrying later: throttling, server errors, network trouble, a crashed worker
+TRANSIENT_ERROR = re.compile(
+    r"HTTP Error (429|5\d\d)|Too Many Requests|rate.?limit|not a bot|timed out|"
+    r"Connection (reset|refused|aborted)|Temporary failure|Name or service not known|"
+    r"Remote end closed|IncompleteRead|TransportError|Unable to download (webpage|API page)|BrokenProcessPool",
+    re.IGNORECASE,
+)
+
+
+def is_transient(error: str | None) -> bool:
+    """Whether a search error is likely to go away on retry."""
+    return bool(error) and TRANSIENT_ERROR.search(error) is not None
+
+
+def backoff(attempt: int, base: float = 2.0, cap: float = 120.0) -> float:
+    """Seconds to wait before retry number attempt (from 0): exponential with full jitter."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class AdaptiveLimiter:
+    """Concurrency limit adjusted by AIMD on error and latency signals.
+
+    Each successful request raises the limit by 1/limit (about +1 per round of
+    requests); a transient error, or a latency well above the running average,
+    halves it. Requests started before the last decrease don't cut it again, so
+    a burst of throttled requests counts as one signal. Slow successes still
+    go into the average, so a lasting slowdown becomes the new baseline rather
+    than cutting the limit down to the minimum.
+    """
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1, latency_factor: float = 3.0):
+        self.limit = float(min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_factor = latency_factor
+        self.in_flight = 0
+        self.latency = None  # running average of successful requests, slow ones included
+        self.samples = 0
+        self.last_decrease = 0.0
+        self.decreases = 0
+        self.cond = asyncio.Condition()
+
+    async def acquire(self) -> float:
+        """Wait for a free slot; returns the start time to pass to release()."""
+        async with self.cond:
+            await self.cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return time.monotonic()
+
+    async def release(self, started: float, ok: bool):
+        now = time.monotonic()
+        latency = now - started
+        slow = self.samples >= 10 and latency > self.latency_factor * self.latency
+        if ok:
+            self.latency = latency if self.latency is None else 0.9 * self.latency + 0.1 * latency
+            self.samples += 1
+        if ok and not slow:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        elif started >= self.last_decrease:
+            self.limit = max(self.minimum, self.limit / 2)
+            self.last_decrease = now
+            self.decreases += 1
+        async with self.cond:
+            self.in_flight -= 1
+            self.cond.notify_all()
+
+
+class LimitedEngine:
+    """A search engine (see search_engine.py) whose searches go through an AdaptiveLimiter.
+
+    Only real searches are limited and timed; cache hits never reach it.
+    """
+
+    def __init__(self, engine, limiter: AdaptiveLimiter):
+        self.engine = engine
+        self.limiter = limiter
+
+    async def search(self, query: str, spec: str = "ytsearch1") -> tuple[str | None, str | None]:
+        started = await self.limiter.acquire()
+        transient = True
+        try:
+            raw, error = await self.engine.search(query, spec)
+            transient = is_transient(error)
+        finally:
+            await self.limiter.release(started, ok=not transient)
+        return raw, error
@@ -2,44 +2,89 @@
 """Re-score existing search results without re-running YouTube searches."""
 
 import json
+import math
 import re
 from pathlib import Path
 
+from fuzzy import match_score, match_scores, normalize_channel, split_query
+
 DATA_DIR = Path(__file__).parent.parent / "data"
 RESULTS_FILE = DATA_DIR / "results.jsonl"
 
+CONFIDENCE_POINTS = {"high": 3, "medium": 2, "low": 1, "none": 0}
 
-def normalize(s: str) -> str:
-    """Normalize string for fuzzy matching: lowercase, strip punctuation."""
-    s = s.lower()
-    s = re.sub(r"[-:_.'\"()[\]!?]", "", s)  # strip common punctuation
-    s = re.sub(r"\s+", " ", s).strip()  # collapse whitespace
-    return s
-
-
-def compute_confidence(query: str, title: str | None, channel: str | None) -> str:
-    """Compute match confidence with punctuation normalization."""
-    if not title and not channel:
-        return "none"
-
-    query_norm = normalize(query)
-    title_norm = normalize(title or "")
-    channel_norm = normalize(channel or "")
+# Uploads that are usually not the track itself, unless the query asks for them
+VARIANT_WORDS = ["cover", "lyrics", "lyric video", "karaoke", "instrumental", "reaction", "nightcore", "sped up"]
+# Whole words only: "cover" is not in "Recovery" or "Discover"
+VARIANT = re.compile(r"\b(" + "|".join(map(re.escape, VARIANT_WORDS)) + r")\b", re.IGNORECASE)
 
-    # Split query into artist and song title
-    parts = query.split(" - ", 1)
-    artist = normalize(parts[0]) if parts else ""
-    song = normalize(parts[1]) if len(parts) > 1 else ""
+# Channels that publish the track itself: YT Music auto-generated, VEVO, official
+OFFICIAL_CHANNEL = re.compile(r"( - topic$|vevo$|official)", re.IGNORECASE)
 
-    artist_match = artist and (artist in channel_norm or artist in title_norm)
-    song_match = song and song in title_norm
 
-    if artist_match and song_match:
-        return "high"
-    elif artist_match or song_match:
-        return "medium"
-    else:
-        return "low"
+def compute_confidence(query: str, title: str | None, channel: str | None) -> str:
+    """Confidence bucket of a single result (see fuzzy.py)."""
+    return match_score(query, title, channel)[1]
+
+
+def candidate_score(query: str, candidate: dict) -> float:
+    """Rank a search candidate: confidence bucket, then match, channel, variant and view count signals.
+
+    The match score and channel and view count bonuses stay under one bucket,
+    so they reorder candidates of equal confidence; a cover or lyric video
+    scores a bucket lower.
+    """
+    score = float(CONFIDENCE_POINTS[candidate["confidence"]])
+    if candidate["confidence"] == "none":
+        return score
+
+    score += candidate["match"] / 250
+    title = candidate.get("title") or ""
+    channel = candidate.get("channel") or ""
+    artist, _ = split_query(query)
+    if OFFICIAL_CHANNEL.search(channel) or (artist and normalize_channel(channel) == artist):
+        score += 0.3
+    asked = {word.lower() for word in VARIANT.findall(query)}
+    if any(word.lower() not in asked for word in VARIANT.findall(title)):
+        score -= 1
+    # log10 of views: 1M views = +0.24, capped at 10M
+    score += min(math.log10((candidate.get("view_count") or 0) + 1), 7) / 25
+    return round(score, 3)
+
+
+def score_rows(queries: list[str], rows: list[dict]):
+    """Set "match" and "confidence" of each result row for queries[i], in one batch."""
+    scores = match_scores(queries, [r.get("title") for r in rows], [r.get("channel") for r in rows])
+    for row, (match, confidence) in zip(rows, scores):
+        row["match"] = match
+        row["confidence"] = confidence
+
+
+def rank_candidates(query: str, candidates: list[dict]) -> list[dict]:
+    """Candidates with "confidence", "match" and "score" set, best first."""
+    score_rows([query] * len(candidates), candidates)
+    for c in candidates:
+        c["score"] = candidate_score(query, c)
+    return sorted(candidates, key=lambda c: c["score"], reverse=True)
+
+
+def rescore(results: list[dict]):
+    """Re-score results in place; those with candidates get the best of them picked again.
+
+    All results and candidates are matched in one batch.
+    """
+    fields = ("video_id", "title", "channel", "view_count", "rank")
+    groups = [[{key: r.get(key) for key in fields}] + r.get("candidates", []) for r in results]
+    score_rows([r["query"] for r, rows in zip(results, groups) for _ in rows], [row for rows in groups for row in rows])
+    for r, rows in zip(results, groups):
+        if "candidates" not in r:
+            r["confidence"], r["match"] = rows[0]["confidence"], rows[0]["match"]
+            continue
+        for row in rows:
+            row["score"] = candidate_score(r["query"], row)
+        rows.sort(key=lambda row: row["score"], reverse=True)
+        r.update({key: rows[0][key] for key in fields + ("confidence", "match", "score")})
+        r["candidates"] = rows[1:]
 
 
 def main(output: str | None = None, show_changes: bool = False):
@@ -48,20 +93,15 @@ def main(output: str | None = None, show_changes: bool = False):
         print(f"Error: {RESULTS_FILE} not found")
         return
 
-    results = []
     changes = []
 
     with RESULTS_FILE.open() as f:
-        for line in f:
-            r = json.loads(line)
-            old_conf = r["confidence"]
-            new_conf = compute_confidence(r["query"], r["title"], r["channel"])
-
-            if old_conf != new_conf:
-                changes.append((r["index"], r["query"], old_conf, new_conf))
-
-            r["confidence"] = new_conf
-            results.append(r)
+        results = [json.loads(line) for line in f]
+    old = [r["confidence"] for r in results]
+    rescore(results)
+    for r, old_conf in zip(results, old):
+        if old_conf != r["confidence"]:
+            changes.append((r["index"], r["query"], old_conf, r["confidence"]))
 
     # Sort by index for consistent output
     results.sort(key=lambda r: r["index"])
@@ -0,0 +1,100 @@
+"""Persistent cache of raw yt-dlp search output, keyed by normalized query."""
+
+import hashlib
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from pathlib import Path
+
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "streaming-migration"
+CACHE_FILE = CACHE_DIR / "yt-search.sqlite"
+DEFAULT_TTL_DAYS = 30
+DEFAULT_MAX_MB = 200
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for cache lookup: NFKC, case-fold, collapse whitespace."""
+    query = unicodedata.normalize("NFKC", query).casefold()
+    return re.sub(r"\s+", " ", query).strip()
+
+
+class SearchCache:
+    """Content-addressed store of raw yt-dlp JSON with TTL and size-based eviction.
+
+    Entries are keyed by a hash of the search spec (e.g. "ytsearch1") and the
+    normalized query, not by position in queries.txt, so reordered, edited or
+    overlapping query lists reuse earlier searches. The default location is
+    shared by every checkout on the machine.
+    """
+
+    def __init__(self, path: Path = CACHE_FILE, ttl_days: float = DEFAULT_TTL_DAYS, max_mb: float = DEFAULT_MAX_MB):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                spec TEXT NOT NULL,
+                query TEXT NOT NULL,
+                raw TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+
+    @staticmethod
+    def key(query: str, spec: str) -> str:
+        return hashlib.sha256(f"{spec}\n{normalize_query(query)}".encode()).hexdigest()
+
+    def get(self, query: str, spec: str = "ytsearch1") -> str | None:
+        """Cached raw output for query, or None if missing or expired."""
+        key = self.key(query, spec)
+        now = time.time()
+        row = self.conn.execute("SELECT raw, created FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[1] > self.ttl:
+            self.misses += 1
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return row[0]
+
+    def put(self, query: str, raw: str, spec: str = "ytsearch1"):
+        """Store the raw output of a successful search."""
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.key(query, spec), spec, normalize_query(query), raw, len(raw.encode()), now, now),
+            )
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones beyond max size. Returns count removed."""
+        with self.conn:
+            removed = self.conn.execute("DELETE FROM results WHERE created < ?", (time.time() - self.ttl,)).rowcount
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                keys = []
+                for key, size in self.conn.execute("SELECT key, size FROM results ORDER BY accessed"):
+                    if excess <= 0:
+                        break
+                    keys.append((key,))
+                    excess -= size
+                self.conn.executemany("DELETE FROM results WHERE key = ?", keys)
+                removed += len(keys)
+        return removed
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,115 @@
+"""Ways of running yt-dlp searches: one subprocess per query, or long-lived in-process workers.
+
+Both return yt-dlp's `--flat-playlist -j` output (one JSON object per line)
+or an error message, so results and the search cache are the same whichever
+engine produced them.
+"""
+
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from yt_dlp import YoutubeDL
+    from yt_dlp.utils import DownloadError
+except ImportError:
+    YoutubeDL = None
+
+# Options equivalent to `yt-dlp --flat-playlist`, without console output
+YDL_OPTIONS = {
+    "extract_flat": "in_playlist",
+    "skip_download": True,
+    "quiet": True,
+    "no_warnings": True,
+    "noprogress": True,
+}
+
+
+class SubprocessEngine:
+    """Run the yt-dlp CLI for each query."""
+
+    async def search(self, query: str, spec: str = "ytsearch1") -> tuple[str | None, str | None]:
+        """(raw output, None) on success, (None, error message) on failure."""
+        proc = await asyncio.create_subprocess_exec(
+            "yt-dlp",
+            "--flat-playlist",
+            "-j",
+            f"{spec}:{query}",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            return None, stderr.decode().strip()
+        return stdout.decode(), None
+
+    def close(self):
+        pass
+
+
+# One YoutubeDL per worker process, reused for every query it handles
+_ydl = None
+
+
+def _init_worker():
+    global _ydl
+    _ydl = YoutubeDL(YDL_OPTIONS)
+
+
+def _search(url: str) -> tuple[str | None, str | None]:
+    try:
+        info = _ydl.extract_info(url, download=False)
+    except DownloadError as e:
+        return None, str(e)
+    except Exception as e:
+        # Extractor bugs and network errors yt-dlp re-raises; the CLI would exit non-zero
+        return None, f"{type(e).__name__}: {e}"
+    entries = (info or {}).get("entries") or []
+    return "".join(json.dumps(YoutubeDL.sanitize_info(entry)) + "\n" for entry in entries), None
+
+
+class InProcessEngine:
+    """Search with yt_dlp.YoutubeDL instances kept alive in a process pool.
+
+    Saves the interpreter start-up and yt-dlp import of every subprocess, and
+    each worker keeps its extractor instances and HTTP connections between
+    queries. YoutubeDL is not thread-safe, hence processes rather than threads.
+    A crashed worker breaks the pool; it is replaced and the search reported
+    as failed, like a yt-dlp subprocess that died.
+    """
+
+    def __init__(self, workers: int | None = None):
+        if YoutubeDL is None:
+            raise ImportError("yt_dlp is not installed (uv sync --extra search)")
+        self.workers = workers or os.cpu_count()
+        self.pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(self.workers, initializer=_init_worker)
+
+    async def search(self, query: str, spec: str = "ytsearch1") -> tuple[str | None, str | None]:
+        """(raw output, None) on success, (None, error message) on failure."""
+        loop = asyncio.get_running_loop()
+        pool = self.pool
+        try:
+            return await loop.run_in_executor(pool, _search, f"{spec}:{query}")
+        except BrokenProcessPool as e:
+            # Searches in flight on the broken pool all land here; replace it once
+            if self.pool is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = self._new_pool()
+            return None, f"BrokenProcessPool: {e}"
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+def make_engine(name: str, workers: int | None = None):
+    """Engine by name: "subprocess", "inprocess", or "auto" (inprocess when yt_dlp is importable)."""
+    if name == "auto":
+        name = "inprocess" if YoutubeDL else "subprocess"
+    if name == "inprocess":
+        return InProcessEngine(workers)
+    return SubprocessEngine()
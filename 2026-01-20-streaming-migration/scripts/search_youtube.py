@@ -2,77 +2,87 @@
 """Search YouTube for video IDs matching local file queries."""
 
 import asyncio
+import heapq
 import json
 import sys
+import time
+from collections import deque
 from pathlib import Path
 
+from rate_limit import AdaptiveLimiter, LimitedEngine, backoff, is_transient
+from rescore import rank_candidates
+from search_cache import DEFAULT_MAX_MB, DEFAULT_TTL_DAYS, SearchCache
+from search_engine import SubprocessEngine, make_engine
+
 QUERIES_FILE = Path(__file__).parent.parent / "data" / "queries.txt"
 OUTPUT_FILE = Path(__file__).parent.parent / "data" / "results.jsonl"
 
 
-def compute_confidence(query: str, title: str | None, channel: str | None) -> str:
-    """Compute match confidence based on query vs title/channel similarity."""
-    if not title and not channel:
-        return "none"
-
-    query_lower = query.lower()
-    title_lower = (title or "").lower()
-    channel_lower = (channel or "").lower()
-
-    # Split query into artist and song title
-    parts = query.split(" - ", 1)
-    artist = parts[0].lower() if parts else ""
-    song = parts[1].lower() if len(parts) > 1 else ""
-
-    artist_match = artist and (artist in channel_lower or artist in title_lower)
-    song_match = song and song in title_lower
-
-    if artist_match and song_match:
-        return "high"
-    elif artist_match or song_match:
-        return "medium"
-    else:
-        return "low"
-
-
-async def search_youtube(index: int, query: str) -> dict:
-    """Search YouTube for a single query using yt-dlp."""
-    proc = await asyncio.create_subprocess_exec(
-        "yt-dlp",
-        "--flat-playlist",
-        "-j",
-        f"ytsearch1:{query}",
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
-    stdout, stderr = await proc.communicate()
+async def search_youtube(index: int, query: str, cache: SearchCache | None = None, engine=None,
+                         candidates: int = 1) -> dict:
+    """Search YouTube for a single query using yt-dlp (or the cache).
 
+    With candidates > 1, the top results are fetched in one search and the
+    best scoring one is kept; the others are stored under "candidates".
+    """
     result = {"index": index, "query": query, "video_id": None, "title": None, "channel": None, "view_count": None, "confidence": "none", "error": None}
+    spec = f"ytsearch{candidates}"
 
-    if proc.returncode != 0:
-        result["error"] = stderr.decode().strip()
-        return result
+    raw = cache.get(query, spec) if cache else None
+    if raw is None:
+        raw, error = await (engine or SubprocessEngine()).search(query, spec)
+        if error is not None:
+            result["error"] = error
+            return result
+
+        if cache:
+            cache.put(query, raw, spec)
 
+    found = []
     try:
-        data = json.loads(stdout.decode())
-        result["video_id"] = data.get("id")
-        result["title"] = data.get("title")
-        result["channel"] = data.get("channel")
-        result["view_count"] = data.get("view_count")
-        result["confidence"] = compute_confidence(query, result["title"], result["channel"])
+        for rank, line in enumerate(line for line in raw.splitlines() if line.strip()):
+            data = json.loads(line)
+            found.append({
+                "video_id": data.get("id"),
+                "title": data.get("title"),
+                "channel": data.get("channel"),
+                "view_count": data.get("view_count"),
+                "rank": rank,
+            })
     except json.JSONDecodeError as e:
         result["error"] = f"JSON decode error: {e}"
+        return result
+    if not found:
+        return result
 
+    ranked = rank_candidates(query, found)
+    best = ranked[0]
+    for key in ("video_id", "title", "channel", "view_count", "confidence", "match"):
+        result[key] = best[key]
+    if candidates > 1:
+        result["score"] = best["score"]
+        result["rank"] = best["rank"]
+        result["candidates"] = ranked[1:]
     return result
 
 
-async def main(start: int = 0, end: int | None = None, concurrency: int = 10, overwrite: bool = False):
-    """Run batch YouTube searches."""
+async def main(start: int = 0, end: int | None = None, concurrency: int = 10, overwrite: bool = False,
+               cache: SearchCache | None = None, engine=None, candidates: int = 1,
+               max_concurrency: int | None = None, max_retries: int = 5):
+    """Run batch YouTube searches.
+
+    Concurrency starts at concurrency and adapts between 1 and max_concurrency.
+    Searches failing with a transient error are retried with backoff, and are
+    left out of the results file (for the next run) once out of retries.
+    """
     all_queries = QUERIES_FILE.read_text().strip().split("\n")
     queries = [(i + start, q) for i, q in enumerate(all_queries[start:end])]
 
     print(f"Searching {len(queries)} queries (index {start} to {start + len(queries) - 1})...")
-    print(f"Concurrency: {concurrency}")
+    limiter = AdaptiveLimiter(concurrency, max_concurrency or concurrency)
+    print(f"Concurrency: {concurrency} (adaptive, max {limiter.maximum})")
+    if candidates > 1:
+        print(f"Candidates per query: {candidates}")
 
     # Load existing results to skip (for resume)
     existing_indices = set()
@@ -92,30 +102,73 @@ async def main(start: int = 0, end: int | None = None, concurrency: int = 10, ov
         return
 
     print(f"Processing {len(queries)} queries...")
+    # Cache hits are served in search_youtube() without taking a slot or a latency sample
+    limited_engine = LimitedEngine(engine or SubprocessEngine(), limiter)
 
-    semaphore = asyncio.Semaphore(concurrency)
     completed = 0
     results = []
+    fresh = deque(queries)
+    retries = []  # heap of (ready time, index, query, attempt)
+    unresolved = []
+    running = set()
+    failed = []
+    wake = asyncio.Event()
 
     # Open file for streaming writes
     mode = "w" if overwrite else "a"
     outfile = OUTPUT_FILE.open(mode)
 
-    async def limited_search(idx: int, q: str):
+    async def limited_search(idx: int, q: str, attempt: int):
         nonlocal completed
-        async with semaphore:
-            result = await search_youtube(idx, q)
-            completed += 1
-            conf = result["confidence"][0].upper() if result["video_id"] else "✗"
-            print(f"[{completed}/{len(queries)}] {conf} [{idx}] {q[:50]}")
-            # Stream write immediately
-            outfile.write(json.dumps(result, ensure_ascii=False) + "\n")
-            outfile.flush()
-            return result
-
-    # Gather preserves order in results
-    results = await asyncio.gather(*[limited_search(idx, q) for idx, q in queries])
-    outfile.close()
+        result = await search_youtube(idx, q, cache, limited_engine, candidates)
+        if is_transient(result["error"]):
+            if attempt < max_retries:
+                delay = backoff(attempt)
+                heapq.heappush(retries, (time.monotonic() + delay, idx, q, attempt + 1))
+                print(f"  retry {attempt + 1}/{max_retries} in {delay:.0f}s "
+                      f"(concurrency {int(limiter.limit)}) [{idx}] {q[:50]}")
+            else:
+                unresolved.append(result)
+                print(f"  gave up after {max_retries} retries [{idx}] {q[:50]}: {result['error'].splitlines()[-1]}")
+            return
+        completed += 1
+        conf = result["confidence"][0].upper() if result["video_id"] else "✗"
+        print(f"[{completed}/{len(queries)}] {conf} [{idx}] {q[:50]}")
+        # Stream write immediately
+        outfile.write(json.dumps(result, ensure_ascii=False) + "\n")
+        outfile.flush()
+        results.append(result)
+
+    def finished(task: asyncio.Task):
+        running.discard(task)
+        if not task.cancelled() and task.exception():
+            failed.append(task.exception())
+        wake.set()
+
+    # Start up to limiter.maximum tasks, due retries before fresh queries. The adaptive limit
+    # is enforced by limited_engine on real searches only, so cache hits aren't held back by it
+    try:
+        while (fresh or retries or running) and not failed:
+            wake.clear()
+            free = len(running) < limiter.maximum
+            if free and retries and retries[0][0] <= time.monotonic():
+                _, idx, q, attempt = heapq.heappop(retries)
+            elif free and fresh:
+                (idx, q), attempt = fresh.popleft(), 0
+            else:
+                timeout = retries[0][0] - time.monotonic() if retries else None
+                try:
+                    await asyncio.wait_for(wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(limited_search(idx, q, attempt))
+            running.add(task)
+            task.add_done_callback(finished)
+        if failed:
+            raise failed[0]
+    finally:
+        outfile.close()
 
     # Summary
     by_conf = {"high": [], "medium": [], "low": [], "none": []}
@@ -123,6 +176,13 @@ async def main(start: int = 0, end: int | None = None, concurrency: int = 10, ov
         by_conf[r["confidence"]].append(r)
 
     print(f"\nDone: {len(results)} total")
+    print(f"  Concurrency: ended at {int(limiter.limit)}, cut {limiter.decreases} times")
+    if unresolved:
+        print(f"  Unresolved: {len(unresolved)} kept failing, not written (re-run to retry)")
+    if cache:
+        print(f"  Cache: {cache.hits} hits, {cache.misses} searched")
+    if candidates > 1:
+        print(f"  Reranked: {sum(1 for r in results if r.get('rank'))} picked a lower search hit")
     print(f"  High:   {len(by_conf['high'])}")
     print(f"  Medium: {len(by_conf['medium'])}")
     print(f"  Low:    {len(by_conf['low'])}")
@@ -150,8 +210,30 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--start", type=int, default=0, help="Start index")
     parser.add_argument("--end", type=int, default=None, help="End index")
-    parser.add_argument("--concurrency", type=int, default=10, help="Parallel requests")
+    parser.add_argument("--concurrency", type=int, default=10, help="Parallel requests to start with")
+    parser.add_argument("--max-concurrency", type=int, default=None,
+                        help="Upper bound for adaptive concurrency (default: 2x --concurrency)")
+    parser.add_argument("--max-retries", type=int, default=5, help="Retries of a search failing with a transient error")
     parser.add_argument("--overwrite", action="store_true", help="Overwrite output file (default: append)")
+    parser.add_argument("--candidates", type=int, default=1,
+                        help="Search hits to score per query, keeping the best (runner-ups stored in the result)")
+    parser.add_argument("--engine", choices=["auto", "subprocess", "inprocess"], default="auto",
+                        help="Run yt-dlp per query, or keep it loaded in worker processes (inprocess if installed)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes for --engine inprocess (default: max concurrency)")
+    parser.add_argument("--no-cache", action="store_true", help="Always search, ignoring the result cache")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL_DAYS, help="Days a cached search stays valid")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_MB, help="Cache size limit in MB")
     args = parser.parse_args()
 
-    asyncio.run(main(args.start, args.end, args.concurrency, args.overwrite))
+    cache = None if args.no_cache else SearchCache(ttl_days=args.cache_ttl, max_mb=args.cache_max_mb)
+    max_concurrency = args.max_concurrency or 2 * args.concurrency
+    engine = make_engine(args.engine, args.workers or max_concurrency)
+    try:
+        asyncio.run(main(args.start, args.end, args.concurrency, args.overwrite, cache, engine, args.candidates,
+                         max_concurrency, args.max_retries))
+    finally:
+        engine.close()
+        if cache:
+            cache.evict()
+            cache.close()